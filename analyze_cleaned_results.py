@@ -1,188 +1,342 @@
 #!/usr/bin/env python3
-import pandas as pd
 import argparse
+import csv
+import json
+import math
+import os
+# pandas and numpy are imported where they're used: they take most of a second, which --help and --summary skip
 
-def analyze_results(show_tags=False, show_domains=False, refusal_mode='both'):
+def load_parquet(path, models=None):
+    """Frame shaped like results_cleaned.tsv, built from the long-format Parquet export.
+
+    Only the columns the analysis uses are read, and with models set only
+    their row groups/rows, so reasoning traces and answers are never decoded.
+    """
+    import columnar
+    filters = [("model", "in", models)] if models else None
+    sample_columns = [c for c in columnar.SAMPLE_COLUMNS if c in pq_columns(path)]
+    long = columnar.load(path, columns=["question_id", "model", "domain", "tags", "any_refusal", "correct"]
+                         + sample_columns, filters=filters)
+    
+    by_question = long.groupby("question_id")
+    by_answer = long.groupby(["question_id", "model"])
+    df = by_answer["correct"].first().unstack("model")
+    df.columns = [f"{model}_correct" for model in df.columns]
+    # Models run with "samples": k, in the same columns create_tsv.py gives them
+    if sample_columns:
+        sampled = long.loc[long["samples"] > 1, "model"].unique()
+        for column in sample_columns:
+            wide = by_answer[column].first().unstack("model")
+            for model in sampled:
+                df[f"{model}_{column}"] = wide[model]
+    df["domain"] = by_question["domain"].first()
+    # results.json has no refusal judgements, so only cleaned exports carry them
+    df["any_refusal"] = by_question["any_refusal"].max().fillna(0).astype(int)
+    tags = by_question["tags"].first().fillna("").str.split("|")
+    for tag in sorted({t for ts in tags for t in ts if t}):
+        df[tag.replace(' ', '_').replace('-', '_').lower()] = tags.apply(lambda ts: int(tag in ts))
+    return df.reset_index()
+
+# Binary tag columns in results_cleaned.tsv
+TAG_COLUMNS = ['adversarial', 'enumeration', 'extraction', 'identification',
+               'quality', 'reasoning', 'sequencing', 'spatial']
+CUBE_KEYS = ['scope', 'group', 'refusal']
+
+def find_models(columns):
+    """{model name: correct column}, for columns ending in '-correct' or '_correct'"""
+    models = {}
+    for col in columns:
+        for suffix in ('-correct', '_correct'):
+            if col.endswith(suffix):
+                models.setdefault(col[:-len(suffix)], col)
+    return models
+
+def _scoped(frame, df, tag_columns):
+    """Rows of frame (whose 'row' column indexes df) once per group their question falls in:
+    scope 'overall', each tag and the domain. The whole set is then repeated under
+    refusal='no-refusal' for questions no model refused."""
+    import pandas as pd
+    parts = [frame.assign(scope='overall', group='all')]
+    if tag_columns:
+        membership = df[tag_columns].melt(ignore_index=False, var_name='group', value_name='member')
+        membership = membership.loc[membership['member'] == 1, ['group']].rename_axis('row').reset_index()
+        parts.append(frame.merge(membership, on='row').assign(scope='tag'))
+    domains = frame.assign(scope='domain', group=df['domain'].to_numpy()[frame['row'].to_numpy()])
+    parts.append(domains[domains['group'].notna()])
+    scoped = pd.concat(parts, ignore_index=True)
+    no_refusal = scoped[df['any_refusal'].to_numpy()[scoped['row'].to_numpy()] == 0]
+    return pd.concat([scoped.assign(refusal='overall'), no_refusal.assign(refusal='no-refusal')],
+                     ignore_index=True)
+
+def accuracy_cube(df, models, tag_columns):
+    """One row per (scope, group, refusal, model) with answered/correct/question counts and accuracy.
+
+    Built from a single melt of the correct columns and one groupby, so adding
+    models or tags only adds rows rather than passes over df.
+    """
+    import pandas as pd
+    df = df.reset_index(drop=True)
+    long = (df[list(models.values())]
+            .set_axis(list(models), axis=1)
+            .melt(ignore_index=False, var_name='model', value_name='correct')
+            .rename_axis('row').reset_index())
+    long['correct'] = pd.to_numeric(long['correct'], errors='coerce')
+    
+    questions = _scoped(pd.DataFrame({'row': range(len(df))}), df, tag_columns)
+    counts = questions.groupby(CUBE_KEYS).size().rename('questions').reset_index()
+    cube = (_scoped(long, df, tag_columns)
+            .groupby(CUBE_KEYS + ['model'], sort=False)
+            .agg(answered=('correct', 'count'), correct=('correct', 'sum'))
+            .reset_index())
+    cube['correct'] = cube['correct'].astype(int)
+    cube['accuracy'] = (cube['correct'] / cube['answered'].where(cube['answered'] > 0) * 100).fillna(0.0)
+    cube = cube.merge(counts, on=CUBE_KEYS, how='left')
+    return counts, cube
+
+def add_confidence_intervals(df, models, tag_columns, cube, resamples, seed=0, workers=None):
+    """Bootstrap CIs for every cube row (ci_low/ci_high, in percent), from one resampling of questions.
+
+    Each (group, model) pair is a column of a questions x columns matrix that is
+    zero outside the group, so every model, tag and domain shares the same resamples.
+    """
+    import numpy as np
+    import pandas as pd
+    import significance
+    df = df.reset_index(drop=True)
+    names = list(models)
+    correct = df[list(models.values())].apply(pd.to_numeric, errors='coerce').to_numpy(dtype=float)
+    answered = ~np.isnan(correct)
+    correct = np.nan_to_num(correct)
+    
+    scoped = _scoped(pd.DataFrame({'row': range(len(df))}), df, tag_columns)
+    group = scoped.groupby(CUBE_KEYS, sort=False).ngroup().to_numpy()
+    members = np.zeros((len(df), group.max() + 1 if len(group) else 0), dtype=np.float32)
+    members[scoped['row'].to_numpy(), group] = 1
+    
+    shape = (len(df), members.shape[1] * len(names))
+    low, high = significance.bootstrap_accuracy(
+        (members[:, :, None] * correct[:, None, :]).reshape(shape),
+        (members[:, :, None] * answered[:, None, :]).reshape(shape),
+        resamples, seed=seed, workers=workers)
+    
+    index = {key: g for key, g in zip(scoped[CUBE_KEYS].itertuples(index=False, name=None), group)}
+    columns = [index[(r.scope, r.group, r.refusal)] * len(names) + names.index(r.model)
+               for r in cube.itertuples(index=False)]
+    return cube.assign(ci_low=low[columns], ci_high=high[columns])
+
+def pairwise_significance(df, models, refusal, resamples, seed=0, workers=None):
+    """McNemar and paired permutation tests between every pair of models"""
+    import numpy as np
+    import pandas as pd
+    import significance
+    if refusal == 'no-refusal':
+        df = df[df['any_refusal'] == 0]
+    correct = df[list(models.values())].apply(pd.to_numeric, errors='coerce').to_numpy(dtype=float)
+    tests = significance.pairwise_tests(np.nan_to_num(correct), ~np.isnan(correct), list(models),
+                                        resamples, seed=seed, workers=workers)
+    return [dict(t, refusal=refusal) for t in tests]
+
+def print_accuracy(cube, models, indent=""):
+    for model in models:
+        row = cube.get(model)
+        if row is not None:
+            ci = ""
+            if not math.isnan(row.get('ci_low', math.nan)):
+                ci = f" [{row['ci_low']:.1f}, {row['ci_high']:.1f}]"
+            print(f"{indent}{model}: {row['correct']}/{row['answered']} = {row['accuracy']:.1f}%{ci}")
+
+def pq_columns(path):
+    import pyarrow.parquet as pq
+    # A single file (columnar.py) or a directory of one file per model (create_tsv.py --parquet)
+    return pq.ParquetDataset(path).schema.names
+
+def sample_report(df, models):
+    """Majority-vote accuracy, pass@1/pass@k and agreement for models run with "samples": k"""
+    import pandas as pd
+    import significance
+    rows = []
+    for model, col in models.items():
+        if f"{model}_samples" not in df.columns:
+            continue
+        n = pd.to_numeric(df[f"{model}_samples"], errors='coerce')
+        answered = n > 0
+        n = n[answered].to_numpy()
+        if not len(n):
+            continue
+        c = pd.to_numeric(df[f"{model}_correct_samples"], errors='coerce')[answered].to_numpy()
+        agreement = pd.to_numeric(df[f"{model}_agreement"], errors='coerce')[answered].to_numpy()
+        majority = pd.to_numeric(df[col], errors='coerce')[answered]
+        k = int(n.min())
+        rows.append({
+            'model': model, 'questions': len(n), 'k': k,
+            'majority_accuracy': majority.mean() * 100,
+            'pass_at_1': significance.pass_at_k(n, c, 1).mean() * 100,
+            'pass_at_k': significance.pass_at_k(n, c, k).mean() * 100,
+            'agreement': agreement.mean() * 100,
+            'unanimous': (agreement == 1).mean() * 100,
+        })
+    return rows
+
+def _number(value):
+    """float(value), or None for blanks and other cells pd.to_numeric would coerce to NaN"""
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    return None if math.isnan(value) else value
+
+def quick_summary(parquet=None, only_models=None, refusal_mode='both'):
+    """Just the overall accuracy sections, counted in plain Python from the TSV (or four Parquet columns) without pandas"""
+    # {refusal: {model: [correct, answered]}}; a blank or non-numeric correct cell is unanswered, as in the cube
+    totals = {'overall': {}, 'no-refusal': {}}
+    def add(model, refused, value):
+        value = _number(value)
+        if value is None:
+            return
+        for refusal in ['overall'] + ([] if refused else ['no-refusal']):
+            counts = totals[refusal].setdefault(model, [0, 0])
+            counts[0] += int(value)
+            counts[1] += 1
+    
+    if parquet:
+        import columnar
+        filters = [("model", "in", only_models)] if only_models else None
+        table = columnar.pq.read_table(parquet, columns=["question_id", "model", "any_refusal", "correct"],
+                                       filters=filters).to_pydict()
+        # A question counts as refused if any model's answer to it was
+        refused = {}
+        for qid, flag in zip(table["question_id"], table["any_refusal"]):
+            refused[qid] = max(refused.get(qid, 0), flag or 0)
+        for qid, model, value in zip(table["question_id"], table["model"], table["correct"]):
+            add(model, refused[qid] != 0, value)
+        models = list(dict.fromkeys(table["model"]))
+    else:
+        with open("results_cleaned.tsv", newline="", encoding="utf-8") as f:
+            reader = csv.reader(f, delimiter="\t")
+            header = next(reader)
+            models = find_models(header)
+            if only_models:
+                models = {m: col for m, col in models.items() if m in only_models}
+            columns = [(model, header.index(col)) for model, col in models.items()]
+            refusal_column = header.index('any_refusal')
+            for row in reader:
+                refused = _number(row[refusal_column]) != 0
+                for model, i in columns:
+                    add(model, refused, row[i])
+    
+    for refusal, title in [('overall', "OVERALL ACCURACY"), ('no-refusal', "ACCURACY (EXCLUDING REFUSALS)")]:
+        if refusal_mode in ['both', refusal]:
+            print(f"=== {title} ===")
+            print_accuracy({model: {'correct': correct, 'answered': answered,
+                                    'accuracy': correct / answered * 100 if answered else 0.0}
+                            for model, (correct, answered) in totals[refusal].items()}, models)
+            print()
+
+def analyze_results(show_tags=False, show_domains=False, refusal_mode='both', parquet=None, only_models=None,
+                    out=None, ci=False, resamples=10000, seed=0, workers=None):
+    import pandas as pd
     # Load the cleaned results
-    df = pd.read_csv("results_cleaned.tsv", sep="\t")
+    if parquet:
+        df = load_parquet(parquet, only_models)
+    else:
+        df = pd.read_csv("results_cleaned.tsv", sep="\t")
     
     print(f"Loaded {len(df)} questions")
     print(f"Questions with any refusal: {df['any_refusal'].sum()}")
     print(f"Questions without refusal: {len(df) - df['any_refusal'].sum()}")
     print()
     
-    # Get model names by finding columns that end with '-correct' or '_correct'
-    model_columns = [col for col in df.columns if col.endswith('-correct') or col.endswith('_correct')]
-    models = []
-    for col in model_columns:
-        if col.endswith('-correct'):
-            models.append(col.replace('-correct', ''))
-        elif col.endswith('_correct'):
-            models.append(col.replace('_correct', ''))
+    models = find_models(df.columns)
+    if only_models:
+        models = {m: col for m, col in models.items() if m in only_models}
     
     print(f"Found {len(models)} models: {', '.join(models)}")
     print()
     
+    tag_columns = [tag for tag in TAG_COLUMNS if tag in df.columns]
+    counts, cube = accuracy_cube(df, models, tag_columns)
+    pairwise = []
+    if ci:
+        cube = add_confidence_intervals(df, models, tag_columns, cube, resamples, seed, workers)
+        for refusal in ['overall', 'no-refusal']:
+            if refusal_mode in ['both', refusal]:
+                pairwise += pairwise_significance(df, models, refusal, resamples, seed, workers)
+    if out:
+        base, ext = os.path.splitext(out)
+        outputs = [(out, cube)]
+        if pairwise:
+            outputs.append((f"{base}_pairwise{ext}", pd.DataFrame(pairwise)))
+        for path, frame in outputs:
+            if ext == '.json':
+                with open(path, 'w') as f:
+                    json.dump(frame.to_dict('records'), f, indent=2)
+            else:
+                frame.to_csv(path, index=False)
+    
+    # Everything below only looks results up in the (small) cube
+    count = {tuple(r[:3]): r[3] for r in counts.itertuples(index=False)}
+    lookup = {}
+    for r in cube.to_dict('records'):
+        lookup.setdefault((r['scope'], r['group'], r['refusal']), {})[r['model']] = r
+    section = lambda scope, group, refusal: lookup.get((scope, group, refusal), {})
+    
     if refusal_mode in ['both', 'overall']:
-        # Calculate overall accuracy
         print("=== OVERALL ACCURACY ===")
-        overall_results = []
-        
-        for model in models:
-            # Try both naming conventions
-            correct_col = None
-            if f"{model}-correct" in df.columns:
-                correct_col = f"{model}-correct"
-            elif f"{model}_correct" in df.columns:
-                correct_col = f"{model}_correct"
-                
-            if correct_col:
-                total_answered = df[correct_col].notna().sum()
-                total_correct = df[correct_col].sum()
-                accuracy = (total_correct / total_answered * 100) if total_answered > 0 else 0
-                
-                overall_results.append({
-                    'Model': model,
-                    'Total_Answered': total_answered,
-                    'Total_Correct': total_correct,
-                    'Accuracy_%': accuracy
-                })
-                
-                print(f"{model}: {total_correct}/{total_answered} = {accuracy:.1f}%")
-        
+        print_accuracy(section('overall', 'all', 'overall'), models)
         print()
     
     if refusal_mode in ['both', 'no-refusal']:
-        # Calculate accuracy excluding refusals
         print("=== ACCURACY (EXCLUDING REFUSALS) ===")
-        no_refusal_results = []
-        
-        # Filter to questions where no model refused
-        no_refusal_df = df[df['any_refusal'] == 0]
-        
-        for model in models:
-            # Try both naming conventions
-            correct_col = None
-            if f"{model}-correct" in no_refusal_df.columns:
-                correct_col = f"{model}-correct"
-            elif f"{model}_correct" in no_refusal_df.columns:
-                correct_col = f"{model}_correct"
-                
-            if correct_col:
-                total_answered = no_refusal_df[correct_col].notna().sum()
-                total_correct = no_refusal_df[correct_col].sum()
-                accuracy = (total_correct / total_answered * 100) if total_answered > 0 else 0
-                
-                no_refusal_results.append({
-                    'Model': model,
-                    'Total_Answered': total_answered,
-                    'Total_Correct': total_correct,
-                    'Accuracy_%': accuracy
-                })
-                
-                print(f"{model}: {total_correct}/{total_answered} = {accuracy:.1f}%")
-        
+        print_accuracy(section('overall', 'all', 'no-refusal'), models)
         print()
     
-    
+    groups = []
     if show_tags:
-        # Tag-based analysis
-        print("\n" + "="*80)
-        print("=== TAG-BASED ANALYSIS ===")
-        
-        # Get all tag columns (binary columns starting with tag names)
-        tag_columns = ['adversarial', 'enumeration', 'extraction', 'identification', 
-                       'quality', 'reasoning', 'sequencing', 'spatial']
-        
-        for tag in tag_columns:
-            if tag in df.columns:
-                print(f"\n--- {tag.upper()} QUESTIONS ---")
-                
-                # Filter to questions with this tag
-                tag_questions = df[df[tag] == 1]
-                tag_no_refusal = tag_questions[tag_questions['any_refusal'] == 0]
-                
-                print(f"Total {tag} questions: {len(tag_questions)}")
-                print(f"{tag} questions without refusals: {len(tag_no_refusal)}")
-                
-                if len(tag_questions) > 0 and refusal_mode in ['both', 'overall']:
-                    print(f"\nOverall accuracy on {tag} questions:")
-                    for model in models:
-                        correct_col = None
-                        if f"{model}-correct" in df.columns:
-                            correct_col = f"{model}-correct"
-                        elif f"{model}_correct" in df.columns:
-                            correct_col = f"{model}_correct"
-                            
-                        if correct_col:
-                            total_answered = tag_questions[correct_col].notna().sum()
-                            total_correct = tag_questions[correct_col].sum()
-                            accuracy = (total_correct / total_answered * 100) if total_answered > 0 else 0
-                            print(f"  {model}: {total_correct}/{total_answered} = {accuracy:.1f}%")
-                
-                if len(tag_no_refusal) > 0 and refusal_mode in ['both', 'no-refusal']:
-                    print(f"\nAccuracy on {tag} questions (excluding refusals):")
-                    for model in models:
-                        correct_col = None
-                        if f"{model}-correct" in df.columns:
-                            correct_col = f"{model}-correct"
-                        elif f"{model}_correct" in df.columns:
-                            correct_col = f"{model}_correct"
-                            
-                        if correct_col:
-                            total_answered = tag_no_refusal[correct_col].notna().sum()
-                            total_correct = tag_no_refusal[correct_col].sum()
-                            accuracy = (total_correct / total_answered * 100) if total_answered > 0 else 0
-                            print(f"  {model}: {total_correct}/{total_answered} = {accuracy:.1f}%")
-
+        groups.append(('tag', "TAG-BASED ANALYSIS", tag_columns))
     if show_domains:
-        # Domain-based analysis
+        domains = sorted(d for d in df['domain'].unique() if pd.notna(d))
+        groups.append(('domain', "DOMAIN-BASED ANALYSIS", domains))
+    
+    for scope, title, names in groups:
         print("\n" + "="*80)
-        print("=== DOMAIN-BASED ANALYSIS ===")
-        
-        # Get all unique domains
-        domains = df['domain'].unique()
-        domains = [d for d in domains if pd.notna(d)]
-        
-        for domain in sorted(domains):
-            print(f"\n--- {domain.upper()} QUESTIONS ---")
-            
-            # Filter to questions with this domain
-            domain_questions = df[df['domain'] == domain]
-            domain_no_refusal = domain_questions[domain_questions['any_refusal'] == 0]
+        print(f"=== {title} ===")
+        for name in names:
+            total = count.get((scope, name, 'overall'), 0)
+            without_refusal = count.get((scope, name, 'no-refusal'), 0)
+            print(f"\n--- {name.upper()} QUESTIONS ---")
+            print(f"Total {name} questions: {total}")
+            print(f"{name} questions without refusals: {without_refusal}")
             
-            print(f"Total {domain} questions: {len(domain_questions)}")
-            print(f"{domain} questions without refusals: {len(domain_no_refusal)}")
+            if total > 0 and refusal_mode in ['both', 'overall']:
+                print(f"\nOverall accuracy on {name} questions:")
+                print_accuracy(section(scope, name, 'overall'), models, "  ")
             
-            if len(domain_questions) > 0 and refusal_mode in ['both', 'overall']:
-                print(f"\nOverall accuracy on {domain} questions:")
-                for model in models:
-                    correct_col = None
-                    if f"{model}-correct" in df.columns:
-                        correct_col = f"{model}-correct"
-                    elif f"{model}_correct" in df.columns:
-                        correct_col = f"{model}_correct"
-                        
-                    if correct_col:
-                        total_answered = domain_questions[correct_col].notna().sum()
-                        total_correct = domain_questions[correct_col].sum()
-                        accuracy = (total_correct / total_answered * 100) if total_answered > 0 else 0
-                        print(f"  {model}: {total_correct}/{total_answered} = {accuracy:.1f}%")
-            
-            if len(domain_no_refusal) > 0 and refusal_mode in ['both', 'no-refusal']:
-                print(f"\nAccuracy on {domain} questions (excluding refusals):")
-                for model in models:
-                    correct_col = None
-                    if f"{model}-correct" in df.columns:
-                        correct_col = f"{model}-correct"
-                    elif f"{model}_correct" in df.columns:
-                        correct_col = f"{model}_correct"
-                        
-                    if correct_col:
-                        total_answered = domain_no_refusal[correct_col].notna().sum()
-                        total_correct = domain_no_refusal[correct_col].sum()
-                        accuracy = (total_correct / total_answered * 100) if total_answered > 0 else 0
-                        print(f"  {model}: {total_correct}/{total_answered} = {accuracy:.1f}%")
+            if without_refusal > 0 and refusal_mode in ['both', 'no-refusal']:
+                print(f"\nAccuracy on {name} questions (excluding refusals):")
+                print_accuracy(section(scope, name, 'no-refusal'), models, "  ")
+    
+    sampled = sample_report(df, models)
+    if sampled:
+        print("\n" + "="*80)
+        print("=== MULTI-SAMPLE MODELS ===")
+        for r in sampled:
+            print(f"{r['model']}: majority vote {r['majority_accuracy']:.1f}%, pass@1 {r['pass_at_1']:.1f}%, "
+                  f"pass@{r['k']} {r['pass_at_k']:.1f}%, agreement {r['agreement']:.1f}% "
+                  f"(unanimous on {r['unanimous']:.1f}% of {r['questions']} questions)")
+    
+    if pairwise:
+        print("\n" + "="*80)
+        print(f"=== PAIRWISE TESTS ({resamples} permutations) ===")
+        for refusal in ['overall', 'no-refusal']:
+            tests = [t for t in pairwise if t['refusal'] == refusal]
+            if not tests:
+                continue
+            print(f"\n--- {'ALL QUESTIONS' if refusal == 'overall' else 'EXCLUDING REFUSALS'} ---")
+            for t in tests:
+                diff = t['a_accuracy'] - t['b_accuracy']
+                print(f"{t['a']} vs {t['b']}: {diff:+.1f} pts on {t['questions']} shared questions "
+                      f"({t['only_a']} vs {t['only_b']} discordant), "
+                      f"McNemar p={t['mcnemar_p']:.3g}, permutation p={t['permutation_p']:.3g}")
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='Analyze VR benchmark results')
@@ -190,6 +344,25 @@ if __name__ == "__main__":
     parser.add_argument('--domains', action='store_true', help='Show domain-based analysis')
     parser.add_argument('--refusal', choices=['both', 'overall', 'no-refusal'], default='both',
                         help='Refusal analysis mode: both (default), overall, or no-refusal')
+    parser.add_argument('--parquet', nargs='?', const='results.parquet',
+                        help='Read the long-format Parquet export (default results.parquet) instead of results_cleaned.tsv')
+    parser.add_argument('--models', help='Comma-separated models to include (default: all)')
+    parser.add_argument('--out', help='Also write the accuracy cube (model x tag/domain x refusal filter) '
+                                      'to this .json or .csv file')
+    
+    parser.add_argument('--summary', action='store_true',
+                        help='Only print overall accuracy per model (fast: skips pandas and the tag/domain breakdown)')
+    parser.add_argument('--ci', action='store_true',
+                        help='Add bootstrap 95%% confidence intervals and pairwise McNemar/permutation tests')
+    parser.add_argument('--resamples', type=int, default=10000, help='Bootstrap resamples / permutations (default 10000)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workers', type=int, help='Processes for resampling (default: one per core)')
     
     args = parser.parse_args()
-    analyze_results(show_tags=args.tags, show_domains=args.domains, refusal_mode=args.refusal)
\ No newline at end of file
+    only_models = args.models.split(',') if args.models else None
+    if args.summary:
+        quick_summary(args.parquet, only_models, args.refusal)
+    else:
+        analyze_results(show_tags=args.tags, show_domains=args.domains, refusal_mode=args.refusal,
+                        parquet=args.parquet, only_models=only_models, out=args.out,
+                        ci=args.ci, resamples=args.resamples, seed=args.seed, workers=args.workers)
\ No newline at end of file
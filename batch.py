@@ -0,0 +1,119 @@
+"""Provider batch-API plumbing for run.py --batch.
+
+A model's pending questions become JSONL files of /v1/chat/completions
+request bodies, split to stay under the provider's input limits, each of which is uploaded, submitted as a batch, polled until it
+finishes, and its output read back line by line. Request lines are written
+one at a time and each image is base64-encoded straight from disk into the
+file in chunks, so neither the batch nor a large image is ever held in
+memory whole. Submitted batches are recorded in batches.json so an
+interrupted run picks them up again instead of resubmitting.
+"""
+import base64, hashlib, json, os, threading, time
+
+BATCH_STATE_PATH = "batches.json"
+POLL_INTERVAL = 30
+TERMINAL = {"completed", "failed", "expired", "cancelled"}
+ENDPOINT = "/v1/chat/completions"
+IMAGE_PLACEHOLDER = "__vr_bench_batch_image__"
+# OpenAI caps a batch input file at 200 MB and 50,000 requests; leave some headroom on the size
+MAX_BATCH_BYTES = 190 * 1000 * 1000
+MAX_BATCH_REQUESTS = 50000
+CHUNK = 3 * 64 * 1024  # multiple of 3 so base64 chunks concatenate without padding
+
+
+def request_body(params):
+    """A chat.completions body as sent on the wire: the client's extra_body merged in"""
+    body = {k: v for k, v in params.items() if k != "extra_body"}
+    body.update(params.get("extra_body") or {})
+    return body
+
+
+def write_request(f, custom_id, params, image_path=None, mime=None):
+    """Write one batch line to f (opened in binary mode).
+
+    With image_path, params must carry IMAGE_PLACEHOLDER as the image URL; the
+    file is streamed into the line as a base64 data URL in its place. Returns
+    (sha256, bytes) of the streamed image, or None.
+    """
+    line = json.dumps({"custom_id": custom_id, "method": "POST", "url": ENDPOINT, "body": request_body(params)},
+                      ensure_ascii=False)
+    if image_path is None:
+        f.write(line.encode("utf-8") + b"\n")
+        return None
+    head, tail = line.split(IMAGE_PLACEHOLDER, 1)
+    f.write(head.encode("utf-8"))
+    f.write(f"data:{mime};base64,".encode("ascii"))
+    sha256, size = hashlib.sha256(), 0
+    with open(image_path, "rb") as img:
+        while chunk := img.read(CHUNK):
+            sha256.update(chunk)
+            size += len(chunk)
+            f.write(base64.b64encode(chunk))
+    f.write(tail.encode("utf-8") + b"\n")
+    return sha256.hexdigest(), size
+
+
+def submit(client, path, metadata=None):
+    """Upload a batch file and start the batch; returns the Batch"""
+    with open(path, "rb") as f:
+        uploaded = client.files.create(file=f, purpose="batch")
+    return client.batches.create(input_file_id=uploaded.id, endpoint=ENDPOINT, completion_window="24h",
+                                 metadata=metadata)
+
+
+def wait(client, batch_id, interval=POLL_INTERVAL, log=print):
+    """Poll until the batch reaches a terminal status; returns the final Batch"""
+    last = None
+    while True:
+        batch = client.batches.retrieve(batch_id)
+        counts = batch.request_counts
+        progress = (batch.status, counts.completed, counts.failed, counts.total) if counts else (batch.status,)
+        if progress != last:
+            done = f" {counts.completed + counts.failed}/{counts.total}" if counts else ""
+            log(f"batch {batch_id}: {batch.status}{done}")
+            last = progress
+        if batch.status in TERMINAL:
+            return batch
+        time.sleep(interval)
+
+
+def read_output(client, file_id):
+    """Yield each line of a batch output/error file as a dict, without downloading it all first"""
+    if not file_id:
+        return
+    with client.files.with_streaming_response.content(file_id) as response:
+        for line in response.iter_lines():
+            if line.strip():
+                yield json.loads(line)
+
+
+class BatchState:
+    """Batches submitted but not yet ingested, persisted in batches.json"""
+    def __init__(self, path=BATCH_STATE_PATH):
+        self.path = path
+        self.lock = threading.Lock()
+        self.batches = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                self.batches = json.load(f)
+
+    def _save(self):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.batches, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def add(self, batch_id, model_name, requests):
+        """requests: {custom_id: image variant info} for what went into the batch"""
+        with self.lock:
+            self.batches[batch_id] = {"model_name": model_name, "requests": requests, "submitted": time.time()}
+            self._save()
+
+    def remove(self, batch_id):
+        with self.lock:
+            self.batches.pop(batch_id, None)
+            self._save()
+
+    def pending(self, model_name):
+        with self.lock:
+            return {bid: b for bid, b in self.batches.items() if b["model_name"] == model_name}
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""Throughput/latency benchmark of run.py's runner modes against mock_server.py.
+
+Starts the mock OpenRouter and xAI endpoints in-process, then runs run.py once
+per mode in a scratch directory (fresh journal, caches off) with synthetic
+models, and reports requests/sec and p50/p95/p99 request latency.
+
+    python3 bench_runner.py --questions 200 --models 3 --xai-models 1 --latency lognormal:1.0,0.5 \\
+        --modes threads,async:8,async:32
+"""
+import argparse, contextlib, json, os, subprocess, sys, tempfile, time
+
+import mock_server
+from metrics import percentile
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def parse_mode(spec):
+    """threads | async:N (N requests in flight per model)"""
+    kind, _, n = spec.partition(":")
+    if kind == "threads":
+        return {"name": spec, "argv": ["--mode", "threads"]}
+    if kind == "async":
+        n = int(n or 8)
+        return {"name": spec, "argv": ["--mode", "async", "--concurrency", str(n),
+                                       "--openrouter-concurrency", "100000", "--xai-concurrency", "100000"]}
+    raise ValueError(f"Unknown mode {spec!r}, use threads or async:N")
+
+
+def worker(config):
+    """Runs in a subprocess inside the scratch directory: one run.py main() with synthetic MODELS"""
+    os.environ.setdefault("OPENROUTER_API_KEY", "mock")
+    os.environ.setdefault("XAI_API_KEY", "mock")
+    sys.path.insert(0, REPO_DIR)
+    import run
+
+    run.MODELS = [{"name": f"mock/openrouter-{i}", "model": f"mock/openrouter-{i}"} for i in range(config["models"])]
+    run.MODELS += [{"name": f"x-ai/mock-{i}", "model": "x-ai/grok-4"} for i in range(config["xai_models"])]
+    run.questions = run.questions[:config["questions"]]
+    argv = config["argv"] + [
+        "--no-response-cache", "--metrics-interval", "0",
+        "--openrouter-rpm", "0", "--xai-rpm", "0", "--max-retries", str(config["max_retries"]),
+        "--openrouter-base-url", config["base_url"],
+        "--xai-api-host", config["xai_host"], "--xai-insecure",
+    ]
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        start = time.time()
+        run.main(argv)
+        wall = time.time() - start
+
+    with open("results.json") as f:
+        results = json.load(f)
+    latencies = [r["timing"]["total"] for rs in results.values() for r in rs]
+    failed = 0
+    if os.path.exists("dead_letters.jsonl"):
+        with open("dead_letters.jsonl") as f:
+            failed = sum(1 for _ in f)
+    print(json.dumps({"wall": wall, "latencies": latencies, "failed": failed}))
+
+
+def run_mode(mode, args, base_url, xai_host):
+    with tempfile.TemporaryDirectory(prefix="vr_bench_") as scratch:
+        os.symlink(os.path.join(REPO_DIR, "images"), os.path.join(scratch, "images"))
+        os.symlink(os.path.join(REPO_DIR, "questions.json"), os.path.join(scratch, "questions.json"))
+        config = {
+            "argv": mode["argv"], "models": args.models, "xai_models": args.xai_models,
+            "questions": args.questions, "max_retries": args.max_retries,
+            "base_url": base_url, "xai_host": xai_host,
+        }
+        proc = subprocess.run([sys.executable, os.path.abspath(__file__), "--worker", json.dumps(config)],
+                              cwd=scratch, capture_output=True, text=True)
+        if proc.returncode != 0:
+            raise RuntimeError(f"{mode['name']} failed:\n{proc.stderr[-2000:]}")
+        return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark run.py runner modes against mock providers")
+    parser.add_argument('--modes', default='threads,async:8,async:32',
+                        help='Comma-separated runner modes: threads, async:N (default threads,async:8,async:32)')
+    parser.add_argument('--questions', type=int, default=100, help='Questions per model (default 100)')
+    parser.add_argument('--models', type=int, default=2, help='Synthetic OpenRouter models (default 2)')
+    parser.add_argument('--xai-models', type=int, default=0, help='Synthetic xAI models (default 0)')
+    parser.add_argument('--max-retries', type=int, default=5)
+    parser.add_argument('--port', type=int, default=0, help='HTTP port for the mock (default: any free port)')
+    parser.add_argument('--xai-port', type=int, default=18766, help='gRPC port for the mock xAI endpoint')
+    parser.add_argument('--json', help='Also write the results table to this JSON file')
+    mock_server.add_provider_args(parser)
+    args = parser.parse_args()
+
+    provider = mock_server.provider_from_args(args)
+    http = mock_server.serve_openai(provider, port=args.port)
+    base_url = f"http://127.0.0.1:{http.server_address[1]}/v1"
+    grpc_server = mock_server.serve_xai(provider, port=args.xai_port) if args.xai_models else None
+    xai_host = f"127.0.0.1:{args.xai_port}"
+
+    print(f"{args.models + args.xai_models} models x {args.questions} questions, latency {args.latency}, "
+          f"errors 429={args.error_429} 500={args.error_500} malformed={args.malformed}\n")
+    print(f"{'mode':<12} {'done':>6} {'failed':>6} {'wall s':>8} {'req/s':>8} {'p50 s':>7} {'p95 s':>7} {'p99 s':>7}  mock")
+    rows = []
+    try:
+        for spec in args.modes.split(","):
+            mode = parse_mode(spec.strip())
+            before = dict(provider.counts)
+            out = run_mode(mode, args, base_url, xai_host)
+            served = {k: provider.counts[k] - before[k] for k in provider.counts}
+            lat = out["latencies"]
+            row = {
+                "mode": mode["name"], "done": len(lat), "failed": out["failed"], "wall": out["wall"],
+                "requests_per_sec": len(lat) / out["wall"] if out["wall"] else 0.0,
+                "p50": percentile(lat, 50), "p95": percentile(lat, 95), "p99": percentile(lat, 99),
+                "mock": served,
+            }
+            rows.append(row)
+            fmt = lambda v: f"{v:7.2f}" if v is not None else f"{'-':>7}"
+            print(f"{row['mode']:<12} {row['done']:>6} {row['failed']:>6} {row['wall']:>8.1f} "
+                  f"{row['requests_per_sec']:>8.2f} {fmt(row['p50'])} {fmt(row['p95'])} {fmt(row['p99'])}  "
+                  f"{served['requests']} reqs, {served['429']}x429 {served['500']}x500 {served['malformed']}xbad")
+    finally:
+        http.shutdown()
+        if grpc_server is not None:
+            grpc_server.stop(0)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(rows, f, indent=2)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 3 and sys.argv[1] == "--worker":
+        worker(json.loads(sys.argv[2]))
+    else:
+        main()
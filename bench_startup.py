@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""Cold-start latency of each CLI.
+
+Runs each command below in a fresh interpreter, in a scratch directory with
+questions.json (no results, no API keys), and reports the median and best wall
+time over --repeat runs next to a bare `python -c pass`. --imports also lists
+each command's slowest imports (python -X importtime), which is usually where
+a regression comes from.
+
+Save a baseline once, then compare against it; the run exits non-zero if any
+command's median got slower than its baseline by more than --tolerance:
+
+    python3 bench_startup.py --save startup_baseline.json
+    python3 bench_startup.py --baseline startup_baseline.json --imports
+"""
+import argparse, json, os, re, statistics, subprocess, sys, tempfile, time
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# name -> interpreter arguments, run in the scratch directory
+COMMANDS = {
+    "python": ["-c", "pass"],
+    "import run": ["-c", f"import sys; sys.path.insert(0, {REPO_DIR!r}); import run"],
+    "run.py --help": [os.path.join(REPO_DIR, "run.py"), "--help"],
+    "run.py --status": [os.path.join(REPO_DIR, "run.py"), "--status"],
+    "create_tsv.py --help": [os.path.join(REPO_DIR, "create_tsv.py"), "--help"],
+    "analyze_cleaned_results.py --help": [os.path.join(REPO_DIR, "analyze_cleaned_results.py"), "--help"],
+    "scoring.py --help": [os.path.join(REPO_DIR, "scoring.py"), "--help"],
+    "question_store.py --help": [os.path.join(REPO_DIR, "question_store.py"), "--help"],
+    "columnar.py --help": [os.path.join(REPO_DIR, "columnar.py"), "--help"],
+    "mock_server.py --help": [os.path.join(REPO_DIR, "mock_server.py"), "--help"],
+    "bench_runner.py --help": [os.path.join(REPO_DIR, "bench_runner.py"), "--help"],
+}
+# Slack on top of --tolerance, so a few ms of noise on a fast command isn't a regression
+SLACK_MS = 20
+
+
+def time_command(argv, cwd, env):
+    start = time.perf_counter()
+    proc = subprocess.run([sys.executable] + argv, cwd=cwd, env=env, capture_output=True, text=True)
+    elapsed = time.perf_counter() - start
+    if proc.returncode != 0:
+        raise RuntimeError(f"{' '.join(argv)} failed:\n{proc.stderr[-2000:]}")
+    return elapsed
+
+
+def slowest_imports(argv, cwd, env, n=5):
+    """[(cumulative ms, module)] of the top-level imports that took longest"""
+    proc = subprocess.run([sys.executable, "-X", "importtime"] + argv, cwd=cwd, env=env, capture_output=True, text=True)
+    imports = []
+    for line in proc.stderr.splitlines():
+        # "import time: self [us] | cumulative | imported package"; top-level imports aren't indented
+        m = re.match(r"import time:\s+\d+ \|\s+(\d+) \| (\S.*)$", line)
+        if m:
+            imports.append((int(m.group(1)) / 1000, m.group(2)))
+    return sorted(imports, reverse=True)[:n]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the cold-start time of each CLI")
+    parser.add_argument('--repeat', type=int, default=5, help='Runs per command (default 5, after one warm-up)')
+    parser.add_argument('--only', help='Comma-separated command names to time (default: all)')
+    parser.add_argument('--imports', action='store_true', help="Also list each command's slowest imports")
+    parser.add_argument('--save', help='Write the medians to this JSON file as a baseline')
+    parser.add_argument('--baseline', help='Compare against a file written by --save; exit 1 on a regression')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help=f'Allowed slowdown vs the baseline, as a fraction (default 0.25, plus {SLACK_MS} ms)')
+    args = parser.parse_args()
+
+    names = args.only.split(",") if args.only else list(COMMANDS)
+    unknown = [name for name in names if name not in COMMANDS]
+    if unknown:
+        parser.error(f"Unknown commands {unknown}, choose from: {', '.join(COMMANDS)}")
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    # Startup shouldn't need credentials, so none are passed
+    env = {k: v for k, v in os.environ.items() if k not in ("OPENROUTER_API_KEY", "XAI_API_KEY")}
+    medians, regressions = {}, []
+    print(f"{'command':<36} {'median ms':>10} {'best ms':>8} {'baseline':>9}")
+    with tempfile.TemporaryDirectory(prefix="vr_bench_startup_") as scratch:
+        os.symlink(os.path.join(REPO_DIR, "questions.json"), os.path.join(scratch, "questions.json"))
+        for name in names:
+            argv = COMMANDS[name]
+            time_command(argv, scratch, env)  # warm-up: OS file cache, .pyc files, the questions index
+            times = [time_command(argv, scratch, env) * 1000 for _ in range(args.repeat)]
+            medians[name] = median = statistics.median(times)
+            before = baseline.get(name)
+            note = f"{before:>9.0f}" if before is not None else f"{'-':>9}"
+            if before is not None and median > before * (1 + args.tolerance) + SLACK_MS:
+                regressions.append(name)
+                note += f"  SLOWER by {median - before:.0f} ms"
+            print(f"{name:<36} {median:>10.0f} {min(times):>8.0f} {note}")
+            if args.imports:
+                for ms, module in slowest_imports(argv, scratch, env):
+                    print(f"    {ms:>8.1f} ms  {module}")
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(medians, f, indent=2)
+        print(f"\nSaved baseline to {args.save}")
+    if regressions:
+        sys.exit(f"\nStartup regressed for: {', '.join(regressions)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""Spending caps and cost-aware ordering for run.py sweeps.
+
+Spend is read from the tokens.cost of every result already recorded for a model
+(cache hits cost nothing), so caps cover the whole sweep across resumes, not
+just the current process. Before each request the expected cost, the model's
+mean cost per answer so far, is reserved against the per-model and global
+caps. A request that would not fit even on what is already spent pauses that
+model (or, for the global cap, the whole run) instead of being sent. One that
+only doesn't fit because of requests still in flight waits for them to settle.
+Until a model has a priced answer its estimate is a guess, so a guess alone
+never pauses it: one request at a time goes out to learn the real cost.
+"""
+import asyncio, random, threading
+from collections import defaultdict
+
+DEFAULT_COST = 0.01  # USD per request assumed before any model has a recorded cost
+WAIT = "wait"  # Budget.try_reserve: fits once in-flight requests settle
+
+
+def result_cost(result):
+    if result.get("cache_hit"):
+        return 0.0
+    return (result.get("tokens") or {}).get("cost") or 0.0
+
+
+def stratified_order(questions, per_stratum=2, seed=0):
+    """Questions reordered so a small random sample covering every tag and domain comes first.
+
+    Costs vary a lot between question types, so spending the first part of the
+    budget on a spread of them makes the remaining-cost estimate trustworthy early.
+    """
+    rng = random.Random(seed)
+    strata = defaultdict(list)
+    for i, q in enumerate(questions):
+        for tag in q.get("tags") or []:
+            strata[("tag", tag)].append(i)
+        strata[("domain", q.get("domain") or "")].append(i)
+
+    sample, picked = [], set()
+    for key in sorted(strata):
+        candidates = [i for i in strata[key] if i not in picked]
+        for i in rng.sample(candidates, min(per_stratum, len(candidates))):
+            picked.add(i)
+            sample.append(i)
+    rng.shuffle(sample)
+    return [questions[i] for i in sample] + [q for i, q in enumerate(questions) if i not in picked]
+
+
+class Budget:
+    def __init__(self, global_cap=None, model_caps=None, default_cost=DEFAULT_COST):
+        self.global_cap = global_cap
+        self.model_caps = model_caps or {}
+        self.default_cost = default_cost
+        self.spent = defaultdict(float)
+        self.priced = defaultdict(int)  # answers with a known, non-cached cost
+        self.reserved = defaultdict(float)
+        self.in_flight = defaultdict(int)  # outstanding reservations
+        self.paused = set()  # model names, or "*" once the global cap is hit
+        self.lock = threading.Lock()
+        self.settled = threading.Condition(self.lock)
+
+    def load(self, all_results):
+        for name, results in all_results.items():
+            for r in results:
+                self._record(name, r)
+
+    def _record(self, name, result):
+        if result.get("cache_hit"):
+            return
+        if (result.get("tokens") or {}).get("cost") is None:
+            if (result.get("stream") or {}).get("cutoff"):
+                # A cut-off stream never reports its cost, but it was still billed; charge the usual amount
+                self.spent[name] += self.estimate(name)
+                self.priced[name] += 1
+            return
+        self.spent[name] += result_cost(result)
+        self.priced[name] += 1
+
+    def estimate(self, name):
+        """Expected cost of one more answer from this model"""
+        if self.priced[name]:
+            return self.spent[name] / self.priced[name]
+        priced = sum(self.priced.values())
+        return sum(self.spent.values()) / priced if priced else self.default_cost
+
+    def _try_reserve(self, name):
+        if name in self.paused or "*" in self.paused:
+            return None
+        cost = self.estimate(name)
+        caps = []
+        if self.model_caps.get(name) is not None:
+            caps.append((name, self.model_caps[name], self.spent[name], self.reserved[name], self.in_flight[name],
+                         not self.priced[name]))
+        if self.global_cap is not None:
+            caps.append(("*", self.global_cap, sum(self.spent.values()), sum(self.reserved.values()),
+                         sum(self.in_flight.values()), not sum(self.priced.values())))
+        for key, cap, spent, _, _, guessed in caps:
+            if spent + cost > cap and not (guessed and spent < cap):
+                self.paused.add(key)
+                return None
+        for key, cap, spent, reserved, in_flight, _ in caps:
+            if in_flight and spent + reserved + cost > cap:
+                return WAIT
+        self.reserved[name] += cost
+        self.in_flight[name] += 1
+        return cost
+
+    def try_reserve(self, name):
+        """Reserve the expected cost of one request. Returns the amount; WAIT if it would fit once in-flight
+        requests settle; or None if a cap is reached, which pauses the model (or the run)"""
+        with self.lock:
+            return self._try_reserve(name)
+
+    def reserve(self, name):
+        """try_reserve, blocking until in-flight requests settle instead of returning WAIT"""
+        with self.lock:
+            while (amount := self._try_reserve(name)) is WAIT:
+                self.settled.wait()
+            return amount
+
+    async def reserve_async(self, name, poll=0.05):
+        """reserve for the async runner, which settles on the same event loop and so can't block it"""
+        while (amount := self.try_reserve(name)) is WAIT:
+            await asyncio.sleep(poll)
+        return amount
+
+    def settle(self, name, reserved, result=None):
+        """Release a reservation (None if there was none), recording the actual cost if the request produced a result"""
+        with self.lock:
+            if reserved is not None:
+                self.reserved[name] -= reserved
+                self.in_flight[name] -= 1
+            if result is not None:
+                self._record(name, result)
+            self.settled.notify_all()
+
+    def is_paused(self, name):
+        return name in self.paused or "*" in self.paused
+
+    def describe(self, name, remaining):
+        cap = self.model_caps.get(name)
+        cap_text = f" of ${cap:.2f} cap" if cap is not None else ""
+        return f"spent ${self.spent[name]:.2f}{cap_text}, est. ${self.estimate(name) * remaining:.2f} to finish"
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""Long-format Parquet export of benchmark results.
+
+results.tsv has ten columns per model with the reasoning traces inline, so
+reading any part of it means parsing all of it. Here every (question, model)
+answer is one row of results.parquet, and the reasoning traces go to
+results_reasoning.parquet keyed by (question_id, model), so loading accuracy
+never touches them. Pass columns= and filters= to load() and only those
+columns and matching row groups are decoded. create_tsv.py --parquet writes
+each as a directory with one file per model, so an incremental build only
+rewrites the models that changed; load() reads a file or a directory alike.
+
+    python3 create_tsv.py --parquet                  # from results.json
+    python3 columnar.py results_cleaned.tsv          # from a wide TSV (e.g. the cleaned one)
+"""
+import argparse, csv, sys
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from journal import question_id
+
+PARQUET_PATH = "results.parquet"
+REASONING_PATH = "results_reasoning.parquet"
+ROW_GROUP_SIZE = 10000
+
+SCHEMA = pa.schema([
+    ("question_id", pa.string()),
+    ("model", pa.string()),
+    ("question", pa.string()),
+    ("image", pa.string()),
+    ("type", pa.string()),
+    ("domain", pa.string()),
+    ("difficulty", pa.string()),
+    ("tags", pa.string()),  # "|"-joined, like tags_original
+    ("any_refusal", pa.int8()),  # null where the source doesn't say
+    ("answer", pa.string()),
+    ("correct", pa.int8()),
+    ("time", pa.float64()),
+    ("prompt_tokens", pa.int64()),
+    ("completion_tokens", pa.int64()),
+    ("reasoning_tokens", pa.int64()),
+    ("total_tokens", pa.int64()),
+    ("cost", pa.float64()),
+    ("cutoff", pa.string()),  # "time" or "tokens" for a stream cut off at a ceiling (correct is then null)
+    ("samples", pa.int32()),  # run.py "samples" mode: answers asked for, how many were right, share giving the majority
+    ("correct_samples", pa.int32()),
+    ("agreement", pa.float64()),
+])
+REASONING_SCHEMA = pa.schema([
+    ("question_id", pa.string()),
+    ("model", pa.string()),
+    ("reasoning", pa.string()),
+])
+METRIC_COLUMNS = ["time", "prompt_tokens", "completion_tokens", "reasoning_tokens", "total_tokens", "cost"]
+SAMPLE_COLUMNS = ["samples", "correct_samples", "agreement"]
+TOKEN_KEYS = {"prompt_tokens": "prompt", "completion_tokens": "completion", "reasoning_tokens": "reasoning",
+              "total_tokens": "total", "cost": "cost"}  # long column -> key in a result's "tokens"
+
+
+class ColumnarWriter:
+    """Buffers answer rows and writes them out a row group at a time"""
+    def __init__(self, path=PARQUET_PATH, reasoning_path=REASONING_PATH, row_group_size=ROW_GROUP_SIZE):
+        self.row_group_size = row_group_size
+        self.writer = pq.ParquetWriter(path, SCHEMA, compression="zstd")
+        self.reasoning_writer = pq.ParquetWriter(reasoning_path, REASONING_SCHEMA, compression="zstd")
+        self.rows = []
+        self.reasoning = []
+        self.count = 0
+
+    def add(self, row, reasoning=None):
+        self.rows.append(row)
+        self.count += 1
+        if reasoning:
+            self.reasoning.append({"question_id": row["question_id"], "model": row["model"], "reasoning": reasoning})
+        if len(self.rows) >= self.row_group_size:
+            self.flush()
+
+    def flush(self):
+        if self.rows:
+            self.writer.write_table(pa.Table.from_pylist(self.rows, schema=SCHEMA))
+            self.rows = []
+        if self.reasoning:
+            self.reasoning_writer.write_table(pa.Table.from_pylist(self.reasoning, schema=REASONING_SCHEMA))
+            self.reasoning = []
+
+    def close(self):
+        self.flush()
+        self.writer.close()
+        self.reasoning_writer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def question_fields(q):
+    """The per-question columns of a row, from a questions.json entry"""
+    return {
+        "question_id": question_id(q),
+        "question": q.get("question"),
+        "image": q.get("image"),
+        "type": q.get("type"),
+        "domain": q.get("domain"),
+        "difficulty": None if q.get("difficulty") is None else str(q.get("difficulty")),
+        "tags": "|".join(q.get("tags") or []),
+        "any_refusal": None,
+    }
+
+
+def answer_row(fields, model, response, correct, sample_stats=(1, None, 1.0)):
+    """One row for a results.json response; tokens come from its "tokens" dict"""
+    tokens = response.get("tokens") or {}
+    row = dict(fields, model=model, answer=response.get("response"), correct=correct, time=response.get("time"))
+    for column, key in TOKEN_KEYS.items():
+        row[column] = tokens.get(key)
+    row["cutoff"] = (response.get("stream") or {}).get("cutoff")
+    row["samples"], row["correct_samples"], row["agreement"] = sample_stats
+    return row
+
+
+def _number(value, kind=float):
+    if value is None or value == "":
+        return None
+    try:
+        return kind(float(value))
+    except ValueError:
+        return None
+
+
+def from_wide_tsv(tsv_path, path=PARQUET_PATH, reasoning_path=REASONING_PATH):
+    """Convert a results.tsv-style file (one column group per model) to the long format.
+
+    Models are found from their correct columns, named either MODEL_correct or
+    MODEL-correct. Tags come from tags_original, or failing that from is_*
+    columns. An any_refusal column, as in results_cleaned.tsv, is carried over.
+    """
+    with open(tsv_path, newline="", encoding="utf-8") as f:
+        reader = csv.DictReader(f, delimiter="\t")
+        columns = reader.fieldnames or []
+        models = []
+        for col in columns:
+            for sep in ("_", "-"):
+                if col.endswith(f"{sep}correct"):
+                    models.append((col[:-len(f"{sep}correct")], sep))
+                    break
+        tag_columns = [c for c in columns if c.startswith("is_")]
+
+        with ColumnarWriter(path, reasoning_path) as writer:
+            for record in reader:
+                if "tags_original" in record:
+                    tags = record["tags_original"] or ""
+                else:
+                    tags = "|".join(c[3:] for c in tag_columns if _number(record.get(c), int))
+                q = {"question": record.get("question", ""), "image": record.get("image", ""),
+                     "type": record.get("type") or None, "domain": record.get("domain") or None,
+                     "difficulty": record.get("difficulty") or None, "tags": [t for t in tags.split("|") if t]}
+                fields = question_fields(q)
+                fields["any_refusal"] = _number(record.get("any_refusal"), int)
+                for model, sep in models:
+                    get = lambda suffix: record.get(f"{model}{sep}{suffix}")
+                    answer, correct = get("answer"), _number(get("correct"), int)
+                    if not answer and correct is None and not get("cutoff"):
+                        continue
+                    row = dict(fields, model=model, answer=answer, correct=correct, cutoff=get("cutoff") or None)
+                    for column in METRIC_COLUMNS + SAMPLE_COLUMNS:
+                        row[column] = _number(get(column), float if column in ("time", "cost", "agreement") else int)
+                    writer.add(row, get("reasoning"))
+    return writer.count, [m for m, _ in models]
+
+
+def load(path=PARQUET_PATH, columns=None, filters=None):
+    """DataFrame of the long table, reading only the given columns and rows matching filters,
+    e.g. load(columns=["model", "correct"], filters=[("model", "in", ["openai/gpt-5"])])"""
+    return pq.read_table(path, columns=columns, filters=filters).to_pandas()
+
+
+def load_reasoning(path=REASONING_PATH, filters=None):
+    return pq.read_table(path, filters=filters).to_pandas()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Convert a wide results TSV to long-format Parquet')
+    parser.add_argument('tsv', help='e.g. results.tsv or results_cleaned.tsv')
+    parser.add_argument('--out', default=PARQUET_PATH)
+    parser.add_argument('--reasoning-out', default=REASONING_PATH)
+    args = parser.parse_args()
+
+    count, models = from_wide_tsv(args.tsv, args.out, args.reasoning_out)
+    if not models:
+        sys.exit(f"No *_correct columns found in {args.tsv}")
+    print(f"Wrote {count} answers from {len(models)} models to {args.out} (reasoning in {args.reasoning_out})")
@@ -1,152 +1,303 @@
 #!/usr/bin/env python3
+"""Builds results.tsv, and with --parquet the long-format Parquet export, from results.json.
+
+Builds are incremental. Each model's answers form a partition: the model's
+span of results.json plus its lines in the results.jsonl journal, identified
+by a content hash. Every partition's rendered TSV cells are cached in
+.build/, and with --parquet so are its files under results.parquet/ and
+results_reasoning.parquet/. A rebuild re-scores only the models whose hash
+changed, in a process pool, then stitches results.tsv back together from the
+cached cells. Changing questions.json or scoring.py rebuilds everything, and
+so does --full.
+"""
 import json
 import csv
+import argparse
+import contextlib, hashlib, io, os, re, shutil
+from concurrent.futures import ProcessPoolExecutor
+from journal import RESULTS_PATH, JOURNAL_PATH, replay, question_id
+from scoring import Scorer
+
+BUILD_DIR = ".build"
+MANIFEST_PATH = os.path.join(BUILD_DIR, "manifest.json")
+BUILD_VERSION = 4
+MODEL_SUFFIXES = ["answer", "reasoning", "correct", "time", "prompt_tokens", "completion_tokens",
+                  "reasoning_tokens", "total_tokens", "cost", "cutoff"]
+SAMPLE_SUFFIXES = ["samples", "correct_samples", "agreement"]
+# compact() writes results.json with indent=2, so each model's list starts on a line like '  "name": ['
+MODEL_KEY = re.compile(rb'\n  ("(?:[^"\\]|\\.)*"): \[')
+
+def score_samples(response, q, scorer):
+    """(samples, correct samples, agreement) for a result; run.py's "samples" mode stores each distinct answer once"""
+    samples = response.get("samples")
+    if not samples:
+        return 1, scorer.score(q, response.get("response", "")), 1.0
+    scores = [scorer.score(q, a) for a in samples["answers"]]
+    return len(samples["picks"]), sum(scores[p] for p in samples["picks"]), samples["agreement"]
+
+def tag_column(tag):
+    return f"is_{tag.replace(' ', '_').replace('-', '_').lower()}"
+
+def question_headers(all_tags):
+    # Binary tag columns, plus the original tags for reference
+    return (["question", "image", "correct_answer", "domain", "alternate_answers", "difficulty"]
+            + [tag_column(tag) for tag in all_tags] + ["tags_original"])
+
+def question_cells(q, all_tags):
+    question_tags = q.get("tags", [])
+    return ([q.get("question", ""), q.get("image", ""), q.get("answer", ""), q.get("domain", ""),
+             "|".join(q.get("alternate_answers", [])), q.get("difficulty", "")]
+            + [1 if tag in question_tags else 0 for tag in all_tags] + ["|".join(question_tags)])
+
+def model_headers(model, sampled):
+    # Models run with "samples": k get extra columns for pass@k and agreement
+    return [f"{model}_{suffix}" for suffix in MODEL_SUFFIXES + (SAMPLE_SUFFIXES if sampled else [])]
+
+def model_cells(response, q, scorer, sampled):
+    """(TSV cells of one model's answer to q, whether it's correct (None if cut off), sample stats)"""
+    model_answer = response.get("response", "")
+    # A stream cut off at a --max-seconds/--max-stream-tokens ceiling ("time" or "tokens") never gave its final
+    # answer, so it's left unscored and the analysis counts it as unanswered rather than wrong
+    cutoff = (response.get("stream") or {}).get("cutoff")
+    # Auto-score the answer (see scoring.py for the rules)
+    correct = None if cutoff else scorer.score(q, model_answer)
+    tokens = response.get("tokens") or {}
+    cells = [model_answer, response.get("reasoning", "") or "", "" if correct is None else correct,
+             response.get("time", ""), tokens.get("prompt", ""), tokens.get("completion", ""),
+             tokens.get("reasoning", ""), tokens.get("total", ""), tokens.get("cost", ""), cutoff or ""]
+    # Majority answer scored above; here how many of the k samples were right
+    sample_stats = score_samples(response, q, scorer)
+    if sampled:
+        cells.extend(sample_stats)
+    return cells, correct, sample_stats
+
+def tsv_row(row):
+    """One row as UTF-8 TSV bytes, quoted as csv.DictWriter would, ending in CRLF"""
+    buf = io.StringIO()
+    csv.writer(buf, delimiter="\t").writerow(row)
+    return buf.getvalue().encode("utf-8")
+
+def _digest(*parts):
+    h = hashlib.sha1()
+    for part in parts:
+        h.update(part if isinstance(part, bytes) else part.encode("utf-8"))
+    return h.hexdigest()
+
+def _slug(model):
+    return re.sub(r"[^A-Za-z0-9._-]+", "_", model) + "-" + _digest(model)[:8]
+
+def _parquet_paths(slug):
+    import columnar
+    return (os.path.join(columnar.PARQUET_PATH, f"{slug}.parquet"),
+            os.path.join(columnar.REASONING_PATH, f"{slug}.parquet"))
+
+def _fingerprint(results):
+    return _digest(json.dumps(results, sort_keys=True, ensure_ascii=False))
+
+def model_spans(manifest, results_path=RESULTS_PATH):
+    """{model: [offset, length, sha1]} of each model's list in results.json, found without parsing it.
+
+    Reused from the last build when results.json hasn't changed. None unless
+    the file is laid out exactly as compact() writes it, so the caller falls
+    back to json.load rather than trusting a partial scan.
+    """
+    st = os.stat(results_path)
+    source = {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+    if manifest.get("results", {}).get("source") == source:
+        return manifest["results"]["spans"]
+    with open(results_path, "rb") as f:
+        data = f.read()
+    keys = [] if data.strip() == b"{}" else list(MODEL_KEY.finditer(data))
+    if data.strip() != b"{}" and (not keys or keys[0].start() != 1 or not data.startswith(b"{\n")):
+        return None
+    spans = {}
+    for i, m in enumerate(keys):
+        start = m.end() - 1
+        last = i + 1 == len(keys)
+        end = len(data) if last else keys[i + 1].start()
+        # Each list must run right up to the next key: closed at two-space indent and followed by "," (or the
+        # closing brace), otherwise the regex matched something else (another indent, a nested key) and the
+        # spans don't cover the document
+        chunk = data[start:end].rstrip()
+        close = b"\n}" if last else b","
+        if not (chunk.endswith(b"\n  ]" + close) or chunk == b"[]" + close):
+            return None
+        chunk = chunk[:-len(close)]
+        spans[json.loads(m.group(1))] = [start, len(chunk), _digest(chunk)]
+    if len(spans) != len(keys):
+        return None  # a repeated key; json.load keeps the last one
+    manifest["results"] = {"source": source, "spans": spans}
+    return spans
 
-def score_answer(model_answer, correct_answer, alternate_answers):
-    """Score model answer against correct + alternate answers"""
-    if not model_answer:
-        return 0
-    
-    model_clean = str(model_answer).strip().lower()
-    
-    # Check against correct answer
-    if correct_answer and model_clean == str(correct_answer).strip().lower():
-        return 1
-    
-    # Check against alternate answers
-    if alternate_answers:
-        for alt in alternate_answers:
-            if alt and model_clean == str(alt).strip().lower():
-                return 1
-    
-    return 0
-
-def create_tsv():
+# Per-process state for build_model: questions, their ids and the scorer, loaded once per worker
+_questions = _ids = _scorer = None
+
+def _load_questions(questions):
+    global _questions, _ids, _scorer
+    _questions = questions
+    _ids = [question_id(q) for q in questions]
+    # Expected answers are normalized once up front
+    _scorer = Scorer(questions)
+
+def build_model(task):
+    """Score and render one model's answers into its cached TSV cells (and Parquet files); returns its manifest entry"""
+    name, slug, source, journaled, parquet = task
+    if isinstance(source, list):
+        results = source
+    else:
+        offset, length = source
+        with open(RESULTS_PATH, "rb") as f:
+            f.seek(offset)
+            results = json.loads(f.read(length))
+    # Journaled answers come after results.json's; the first answer to a question wins
+    by_id = {}
+    for r in results + journaled:
+        by_id.setdefault(r.get("question_id") or question_id(r), r)
+    sampled = any(r.get("samples") for r in by_id.values())
+
+    empty = tsv_row([""] * len(model_headers(name, sampled)))
+    # Rows are written as they're scored; offsets[i] is where question i's row starts in the file
+    answers, offsets = [], [0]
+    with open(os.path.join(BUILD_DIR, f"{slug}.tsv"), "wb") as f:
+        for q, qid in zip(_questions, _ids):
+            response = by_id.get(qid)
+            if not response:
+                f.write(empty)
+            else:
+                cells, correct, sample_stats = model_cells(response, q, _scorer, sampled)
+                f.write(tsv_row(cells))
+                answers.append((q, qid, correct, sample_stats))
+            offsets.append(f.tell())
+
+    if parquet:
+        import columnar
+        written = set()
+        with columnar.ColumnarWriter(*_parquet_paths(slug)) as writer:
+            for q, qid, correct, sample_stats in answers:
+                # questions.json repeats a question or two; one row per answer is enough here
+                if qid not in written:
+                    written.add(qid)
+                    response = by_id[qid]
+                    writer.add(columnar.answer_row(columnar.question_fields(q), name, response, correct, sample_stats),
+                               response.get("reasoning"))
+    return {"slug": slug, "sampled": sampled, "answers": len({qid for _, qid, *_ in answers}), "offsets": offsets,
+            "parquet": parquet}
+
+def build_models(questions, tasks, workers=None):
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers <= 1 or len(tasks) <= 1:
+        _load_questions(questions)
+        return [build_model(task) for task in tasks]
+    with ProcessPoolExecutor(max_workers=min(workers, len(tasks)), initializer=_load_questions,
+                             initargs=(questions,)) as pool:
+        return list(pool.map(build_model, tasks))
+
+def create_tsv(parquet=False, full=False, workers=None):
     # Load questions
-    with open("questions.json") as f:
-        questions = json.load(f)
-    
-    # Load results (if exists)
-    results = {}
-    try:
-        with open("results.json") as f:
+    with open("questions.json", "rb") as f:
+        raw_questions = f.read()
+    questions = json.loads(raw_questions)
+    with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), "scoring.py"), "rb") as f:
+        rules = f.read()
+    inputs = _digest(str(BUILD_VERSION), raw_questions, rules)
+
+    manifest = {}
+    if full:
+        import columnar
+        for path in (BUILD_DIR, columnar.PARQUET_PATH, columnar.REASONING_PATH):
+            if os.path.isdir(path):
+                shutil.rmtree(path)
+    elif os.path.exists(MANIFEST_PATH):
+        with open(MANIFEST_PATH) as f:
+            manifest = json.load(f)
+    if manifest.get("version") != BUILD_VERSION or manifest.get("inputs") != inputs:
+        # Questions or scoring rules changed: every cached cell is stale
+        # The results.json spans only depend on results.json itself, unless the scanner changed too
+        spans = manifest.get("results", {}) if manifest.get("version") == BUILD_VERSION else {}
+        manifest = {"results": spans, "models": manifest.get("models", {}), "stale": True}
+    os.makedirs(BUILD_DIR, exist_ok=True)
+    if parquet:
+        import columnar
+        for path in (columnar.PARQUET_PATH, columnar.REASONING_PATH):
+            if os.path.isfile(path):
+                os.remove(path)  # a single-file export from before partitioning
+            os.makedirs(path, exist_ok=True)
+
+    # Each model's source: its span of results.json (or its parsed list, for other layouts) plus journal lines
+    sources, fingerprints = {}, {}
+    spans = model_spans(manifest) if os.path.exists(RESULTS_PATH) else {}
+    if spans is None:
+        with open(RESULTS_PATH) as f:
             results = json.load(f)
-    except FileNotFoundError:
+        for model, rs in results.items():
+            sources[model], fingerprints[model] = rs, _fingerprint(rs)
+    else:
+        for model, (offset, length, digest) in spans.items():
+            sources[model], fingerprints[model] = (offset, length), digest
+    if not os.path.exists(RESULTS_PATH) and not sources:
         print("No results.json found, creating empty TSV structure")
-    
-    # Get all model names from results
-    model_names = list(results.keys()) if results else []
-    
-    # Get all unique tags for binary columns
-    all_tags = set()
-    for q in questions:
-        all_tags.update(q.get("tags", []))
-    all_tags = sorted(list(all_tags))
-    
-    # Create TSV headers
-    headers = [
-        "question", "image", "correct_answer", "domain", 
-        "alternate_answers", "difficulty"
-    ]
-    
-    # Add binary tag columns
-    for tag in all_tags:
-        headers.append(f"is_{tag.replace(' ', '_').replace('-', '_').lower()}")
-    
-    # Keep original tags column for reference
-    headers.append("tags_original")
-    
-    # Add columns for each model (answer + reasoning + token data + timing)
+    journaled = {}
+    for model, r in replay(JOURNAL_PATH):
+        journaled.setdefault(model, []).append(r)
+    for model, rs in journaled.items():
+        sources.setdefault(model, [])
+        fingerprints[model] = _digest(fingerprints.get(model, ""), _fingerprint(rs))
+    model_names = list(sources)
+
+    # Rebuild the models whose answers changed since the cached build
+    previous = manifest.get("models", {})
+    tasks = []
     for model in model_names:
-        headers.extend([
-            f"{model}_answer", 
-            f"{model}_reasoning", 
-            f"{model}_correct",
-            f"{model}_time",
-            f"{model}_prompt_tokens",
-            f"{model}_completion_tokens", 
-            f"{model}_reasoning_tokens",
-            f"{model}_total_tokens",
-            f"{model}_cost"
-        ])
-    
-    # Create TSV data
-    rows = []
-    
-    for q in questions:
-        row = {
-            "question": q.get("question", ""),
-            "image": q.get("image", ""),
-            "correct_answer": q.get("answer", ""),
-            "domain": q.get("domain", ""),
-            "alternate_answers": "|".join(q.get("alternate_answers", [])),
-            "difficulty": q.get("difficulty", "")
-        }
-        
-        # Add binary tag columns
-        question_tags = q.get("tags", [])
-        for tag in all_tags:
-            row[f"is_{tag.replace(' ', '_').replace('-', '_').lower()}"] = 1 if tag in question_tags else 0
-        
-        # Keep original tags for reference
-        row["tags_original"] = "|".join(question_tags)
-        
-        # Add model responses
-        for model in model_names:
-            model_responses = results.get(model, [])
-            
-            # Find response for this question
-            response = None
-            for r in model_responses:
-                if (r.get("question") == q.get("question") and 
-                    r.get("image") == q.get("image")):
-                    response = r
-                    break
-            
-            if response:
-                model_answer = response.get("response", "")
-                row[f"{model}_answer"] = model_answer
-                row[f"{model}_reasoning"] = response.get("reasoning", "") or ""
-                
-                # Auto-score the answer
-                score = score_answer(
-                    model_answer, 
-                    q.get("answer"), 
-                    q.get("alternate_answers", [])
-                )
-                row[f"{model}_correct"] = score
-                
-                # Add timing and token data
-                row[f"{model}_time"] = response.get("time", "")
-                
-                tokens = response.get("tokens", {})
-                row[f"{model}_prompt_tokens"] = tokens.get("prompt", "")
-                row[f"{model}_completion_tokens"] = tokens.get("completion", "")
-                row[f"{model}_reasoning_tokens"] = tokens.get("reasoning", "")
-                row[f"{model}_total_tokens"] = tokens.get("total", "")
-                row[f"{model}_cost"] = tokens.get("cost", "")
-                
-            else:
-                row[f"{model}_answer"] = ""
-                row[f"{model}_reasoning"] = ""  
-                row[f"{model}_correct"] = ""
-                row[f"{model}_time"] = ""
-                row[f"{model}_prompt_tokens"] = ""
-                row[f"{model}_completion_tokens"] = ""
-                row[f"{model}_reasoning_tokens"] = ""
-                row[f"{model}_total_tokens"] = ""
-                row[f"{model}_cost"] = ""
-        
-        rows.append(row)
-    
-    # Write TSV
-    with open("results.tsv", "w", newline="", encoding="utf-8") as f:
-        writer = csv.DictWriter(f, fieldnames=headers, delimiter="\t")
-        writer.writeheader()
-        writer.writerows(rows)
-    
-    print(f"Created results.tsv with {len(rows)} questions and {len(model_names)} models")
+        entry = previous.get(model)
+        fresh = (entry and not manifest.get("stale") and entry.get("fingerprint") == fingerprints[model]
+                 and (entry["parquet"] or not parquet) and os.path.exists(os.path.join(BUILD_DIR, f"{entry['slug']}.tsv")))
+        if not fresh:
+            tasks.append((model, _slug(model), sources[model], journaled.get(model, []), parquet))
+    entries = {model: previous[model] for model in model_names if model in previous}
+    for task, entry in zip(tasks, build_models(questions, tasks, workers)):
+        entries[task[0]] = dict(entry, fingerprint=fingerprints[task[0]])
+    for model in set(previous) - set(model_names):
+        slug = previous[model]["slug"]
+        for path in [os.path.join(BUILD_DIR, f"{slug}.tsv")] + (list(_parquet_paths(slug)) if previous[model]["parquet"] else []):
+            if os.path.exists(path):
+                os.remove(path)
+
+    manifest = {"version": BUILD_VERSION, "inputs": inputs, "results": manifest.get("results", {}),
+                "models": {model: entries[model] for model in model_names}}
+    tmp_path = MANIFEST_PATH + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f)
+    os.replace(tmp_path, MANIFEST_PATH)
+
+    # Stitch results.tsv together row by row: each question's cells, then its row from every model's cached
+    # file. Only one row per model is in memory at a time, however many models and reasoning traces there are.
+    all_tags = sorted({tag for q in questions for tag in q.get("tags", [])})
+    headers = question_headers(all_tags)
+    for model in model_names:
+        headers.extend(model_headers(model, entries[model]["sampled"]))
+    with contextlib.ExitStack() as stack, open("results.tsv", "wb") as out:
+        partitions = [(stack.enter_context(open(os.path.join(BUILD_DIR, f"{entries[model]['slug']}.tsv"), "rb")),
+                       entries[model]["offsets"]) for model in model_names]
+        out.write(tsv_row(headers))
+        for i, q in enumerate(questions):
+            # Rows follow each other in the cached files, so reading them in order needs no seeks
+            cells = [tsv_row(question_cells(q, all_tags))[:-2]]
+            cells.extend(f.read(offsets[i + 1] - offsets[i])[:-2] for f, offsets in partitions)
+            out.write(b"\t".join(cells) + b"\r\n")
+
+    print(f"Created results.tsv with {len(questions)} questions and {len(model_names)} models "
+          f"({len(tasks)} rebuilt, {len(model_names) - len(tasks)} cached)")
     print(f"Models: {', '.join(model_names)}")
+    if parquet:
+        print(f"Created {columnar.PARQUET_PATH}/ with {sum(entries[m]['answers'] for m in model_names)} answers "
+              f"in one file per model (reasoning traces in {columnar.REASONING_PATH}/)")
 
 if __name__ == "__main__":
-    create_tsv()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='Create results.tsv from results.json')
+    parser.add_argument('--parquet', action='store_true',
+                        help='Also write long-format results.parquet/ and results_reasoning.parquet/')
+    parser.add_argument('--full', action='store_true', help='Ignore the cached build in .build/ and rebuild everything')
+    parser.add_argument('--workers', type=int, help='Processes for rebuilding models (default: one per core)')
+    args = parser.parse_args()
+    create_tsv(parquet=args.parquet, full=args.full, workers=args.workers)
\ No newline at end of file
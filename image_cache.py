@@ -0,0 +1,215 @@
+"""Content-addressed cache of encoded images for run.py.
+
+Each image file is hashed once per (path, size, mtime). The prepared data URL
+is stored once per (content hash, preprocessing settings): in memory in an LRU
+bounded by a byte budget, and optionally in an on-disk pack file that later
+runs mmap to start warm. Resized variants (see image_prep.py) are encoded in a
+process pool so CPU-bound work doesn't stall the request workers, and
+concurrent requests for a variant that's still being encoded share that encode.
+"""
+import base64, hashlib, json, mimetypes, mmap, multiprocessing, os, threading, time
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor
+from image_prep import normalize_settings, settings_key, encode_variant
+
+
+def guess_mime_type(path):
+    mime_type, _ = mimetypes.guess_type(path)
+    if not mime_type or not mime_type.startswith('image/'):
+        mime_type = 'image/jpeg'
+    return mime_type
+
+
+class PackStore:
+    """Append-only pack of data URLs (images.pack) with a JSONL index of (offset, length, info), read through mmap"""
+    def __init__(self, store_dir):
+        os.makedirs(store_dir, exist_ok=True)
+        self.pack_path = os.path.join(store_dir, "images.pack")
+        self.index_path = os.path.join(store_dir, "index.jsonl")
+        self.index = {}  # key -> (offset, length, variant info)
+        self.map = None
+        self.lock = threading.Lock()
+        if os.path.exists(self.index_path):
+            pack_size = os.path.getsize(self.pack_path) if os.path.exists(self.pack_path) else 0
+            with open(self.index_path) as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    # Ignore entries whose bytes never made it into the pack
+                    if entry["offset"] + entry["length"] <= pack_size:
+                        self.index[entry["key"]] = (entry["offset"], entry["length"], entry["info"])
+
+    def get(self, key):
+        with self.lock:
+            loc = self.index.get(key)
+            if loc is None:
+                return None
+            offset, length, info = loc
+            if self.map is None or offset + length > len(self.map):
+                self._remap()
+            return self.map[offset:offset + length].decode("ascii"), info
+
+    def put(self, key, url, info):
+        with self.lock:
+            if key in self.index:
+                return
+            raw = url.encode("ascii")
+            with open(self.pack_path, "ab") as f:
+                offset = f.tell()
+                f.write(raw)
+            with open(self.index_path, "a") as f:
+                f.write(json.dumps({"key": key, "offset": offset, "length": len(raw), "info": info}) + "\n")
+            self.index[key] = (offset, len(raw), info)
+
+    def _remap(self):
+        if self.map is not None:
+            self.map.close()
+        with open(self.pack_path, "rb") as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def __len__(self):
+        return len(self.index)
+
+
+class ImageCache:
+    def __init__(self, max_bytes=512 * 1024 * 1024, store_dir=None, prep_workers=None):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.entries = OrderedDict()  # variant key -> (data URL, variant info)
+        self.hashes = {}  # path -> (size, mtime_ns, content hash)
+        self.lock = threading.Lock()
+        self.hits = self.misses = 0
+        self.store = PackStore(store_dir) if store_dir else None
+        self.prep_workers = prep_workers
+        self.pool = None
+        self.in_flight = {}  # variant key -> Future of the encode under way, shared by concurrent callers
+
+    def _lookup(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return entry
+        if self.store is not None:
+            entry = self.store.get(key)
+            if entry is not None:
+                self._insert(key, entry)
+                with self.lock:
+                    self.hits += 1
+                return entry
+        return None
+
+    def _insert(self, key, entry):
+        with self.lock:
+            if key in self.entries:
+                return
+            self.entries[key] = entry
+            self.bytes += len(entry[0])
+            while self.bytes > self.max_bytes and len(self.entries) > 1:
+                _, (evicted, _) = self.entries.popitem(last=False)
+                self.bytes -= len(evicted)
+
+    def _encode(self, path, raw, content_hash, settings):
+        if settings is None:
+            url = f"data:{guess_mime_type(path)};base64,{base64.b64encode(raw).decode('utf-8')}"
+            return url, {"sha256": content_hash, "settings": None, "bytes": len(raw)}
+        with self.lock:
+            if self.pool is None:
+                # Spawned, not forked: the pool starts lazily while request threads hold locks (and gRPC's),
+                # which a forked child would inherit held
+                self.pool = ProcessPoolExecutor(max_workers=self.prep_workers,
+                                                mp_context=multiprocessing.get_context("spawn"))
+        url, info = self.pool.submit(encode_variant, raw, settings).result()
+        return url, {"sha256": content_hash, "settings": settings, **info}
+
+    def file_hash(self, path):
+        """(sha256, bytes) of the file at path, read in chunks and remembered per (path, size, mtime)"""
+        st = os.stat(path)
+        known = self.hashes.get(path)
+        if known and known[:2] == (st.st_size, st.st_mtime_ns):
+            return known[2], st.st_size
+        sha256 = hashlib.sha256()
+        with open(path, "rb") as f:
+            while chunk := f.read(1 << 20):
+                sha256.update(chunk)
+        self.hashes[path] = (st.st_size, st.st_mtime_ns, sha256.hexdigest())
+        return sha256.hexdigest(), st.st_size
+
+    def get(self, path, settings=None, timings=None):
+        """Return (data URL, variant info) for the image at path, preprocessed per settings if given.
+
+        If a timings dict is passed, seconds spent reading and encoding are added to it.
+        """
+        timings = {} if timings is None else timings
+        timings.setdefault("read", 0.0)
+        timings.setdefault("encode", 0.0)
+        settings = normalize_settings(settings)
+        start = time.perf_counter()
+        st = os.stat(path)
+        raw = None
+        known = self.hashes.get(path)
+        if known and known[:2] == (st.st_size, st.st_mtime_ns):
+            content_hash = known[2]
+        else:
+            with open(path, "rb") as f:
+                raw = f.read()
+            content_hash = hashlib.sha256(raw).hexdigest()
+            self.hashes[path] = (st.st_size, st.st_mtime_ns, content_hash)
+        timings["read"] += time.perf_counter() - start
+
+        key = content_hash if settings is None else f"{content_hash}-{settings_key(settings)}"
+        start = time.perf_counter()
+        entry = self._lookup(key)
+        if entry is not None:
+            timings["read"] += time.perf_counter() - start
+            return entry
+
+        # Concurrent requests for the same uncached variant wait on one encode instead of each running their own
+        with self.lock:
+            entry = self.entries.get(key)  # finished since the lookup above
+            shared = None if entry is not None else self.in_flight.get(key)
+            if entry is None and shared is None:
+                self.in_flight[key] = Future()
+            else:
+                self.hits += 1
+        if entry is not None:
+            timings["read"] += time.perf_counter() - start
+            return entry
+        if shared is not None:
+            timings["read"] += time.perf_counter() - start
+            start = time.perf_counter()
+            entry = shared.result()
+            timings["encode"] += time.perf_counter() - start
+            return entry
+
+        try:
+            if raw is None:
+                with open(path, "rb") as f:
+                    raw = f.read()
+            timings["read"] += time.perf_counter() - start
+            with self.lock:
+                self.misses += 1
+            start = time.perf_counter()
+            entry = self._encode(path, raw, content_hash, settings)
+            timings["encode"] += time.perf_counter() - start
+            self._insert(key, entry)
+            if self.store is not None:
+                self.store.put(key, *entry)
+        except BaseException as e:
+            with self.lock:
+                self.in_flight.pop(key).set_exception(e)
+            raise
+        with self.lock:
+            self.in_flight.pop(key).set_result(entry)
+        return entry
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self.entries), "bytes": self.bytes}
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.pool = None
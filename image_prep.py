@@ -0,0 +1,81 @@
+"""Resize/recompress images to a model's pixel budget before they are sent.
+
+A model config opts in with an "image" entry, e.g.
+    {"name": ..., "model": ..., "image": {"max_edge": 1568, "format": "jpeg", "quality": 85}}
+Keys: max_edge (longest side in px), max_pixels (width * height), format
+(jpeg/png/webp; defaults to the source format) and quality (jpeg/webp, default 85).
+Images already inside the budget are only recompressed, never upscaled.
+
+encode_variant runs in a process pool (see ImageCache), so it takes and returns
+plain picklable values. Pillow is only imported when a model asks for this.
+"""
+import base64, hashlib, io, json, math
+
+FORMATS = {"jpeg": ("JPEG", "image/jpeg"), "jpg": ("JPEG", "image/jpeg"),
+           "png": ("PNG", "image/png"), "webp": ("WEBP", "image/webp")}
+SETTING_KEYS = ("max_edge", "max_pixels", "format", "quality")
+
+
+def normalize_settings(settings):
+    """Canonical form of a model's image settings, or None to send the original file"""
+    if not settings:
+        return None
+    unknown = set(settings) - set(SETTING_KEYS)
+    if unknown:
+        raise ValueError(f"Unknown image settings: {', '.join(sorted(unknown))}")
+    fmt = settings.get("format")
+    if fmt and fmt.lower() not in FORMATS:
+        raise ValueError(f"Unsupported image format {fmt!r}, use one of {', '.join(FORMATS)}")
+    normalized = {k: settings[k] for k in SETTING_KEYS if settings.get(k) is not None}
+    if "format" in normalized:
+        normalized["format"] = normalized["format"].lower().replace("jpg", "jpeg")
+    return normalized
+
+
+def settings_key(settings):
+    return hashlib.sha1(json.dumps(settings, sort_keys=True).encode("utf-8")).hexdigest()[:10]
+
+
+def target_size(width, height, settings):
+    scale = 1.0
+    if settings.get("max_edge"):
+        scale = min(scale, settings["max_edge"] / max(width, height))
+    if settings.get("max_pixels"):
+        scale = min(scale, math.sqrt(settings["max_pixels"] / (width * height)))
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+
+def encode_variant(raw, settings):
+    """Resize and re-encode image bytes per settings. Returns (data URL, variant info)."""
+    from PIL import Image, ImageOps
+
+    img = Image.open(io.BytesIO(raw))
+    source_format = (img.format or "JPEG").lower()
+    img = ImageOps.exif_transpose(img)
+    original_size = img.size
+    size = target_size(*img.size, settings)
+    if size != img.size:
+        img = img.resize(size, Image.LANCZOS)
+
+    pil_format, mime_type = FORMATS.get(settings.get("format") or source_format, FORMATS["jpeg"])
+    if pil_format == "JPEG" and img.mode != "RGB":
+        # JPEG has no alpha: flatten transparent images onto white
+        img = img.convert("RGBA")
+        flat = Image.new("RGB", img.size, (255, 255, 255))
+        flat.paste(img, mask=img.getchannel("A"))
+        img = flat
+
+    buf = io.BytesIO()
+    save_args = {"optimize": True}
+    if pil_format in ("JPEG", "WEBP"):
+        save_args["quality"] = settings.get("quality", 85)
+    img.save(buf, format=pil_format, **save_args)
+    encoded = buf.getvalue()
+
+    info = {
+        "original_size": list(original_size),
+        "size": list(img.size),
+        "format": mime_type,
+        "bytes": len(encoded),
+    }
+    return f"data:{mime_type};base64,{base64.b64encode(encoded).decode('utf-8')}", info
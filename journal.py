@@ -0,0 +1,233 @@
+"""Append-only results journal for run.py.
+
+Every finished answer becomes one JSON line in results.jsonl instead of a full
+rewrite of results.json. Lines are fsync'd in batches, so a crash loses at most
+the last unsynced batch; a line torn by the crash is cut off before the next
+run appends, so it can't swallow the first new answer. compact() folds the journal back into the
+results.json layout that create_tsv.py reads.
+"""
+import argparse, json, os, tempfile, threading, hashlib
+from datetime import datetime
+
+RESULTS_PATH = "results.json"
+JOURNAL_PATH = "results.jsonl"
+DEAD_LETTER_PATH = "dead_letters.jsonl"
+
+
+def question_id(q):
+    """Stable short id for a question (or a result): hash of its text and image"""
+    return hashlib.sha1(f"{q['question']}\0{q['image']}".encode("utf-8")).hexdigest()[:12]
+
+
+class ResultIndex:
+    """Completed work keyed by (model name, question id, image).
+
+    Built once from the loaded results and updated as answers arrive, so
+    checking whether a question is done is a set lookup rather than a scan.
+    """
+    def __init__(self, results=None):
+        self.done = set()
+        for name, rs in (results or {}).items():
+            for r in rs:
+                self.add(name, r)
+
+    @staticmethod
+    def key(model_name, q):
+        return (model_name, q.get("question_id") or question_id(q), q["image"])
+
+    def add(self, model_name, result):
+        self.done.add(self.key(model_name, result))
+
+    def has(self, model_name, q):
+        return self.key(model_name, q) in self.done
+
+    def remaining(self, model_name, questions):
+        return [q for q in questions if not self.has(model_name, q)]
+
+
+class ResultsJournal:
+    def __init__(self, path=JOURNAL_PATH, batch_size=20):
+        self.path = path
+        self.batch_size = max(1, batch_size)
+        self.lock = threading.Lock()
+        self.unsynced = 0
+        drop_torn_tail(path)
+        self.f = open(path, "a", encoding="utf-8")
+
+    def append(self, model_name, result):
+        line = json.dumps({"model_name": model_name, "result": result}, ensure_ascii=False)
+        with self.lock:
+            self.f.write(line + "\n")
+            self.unsynced += 1
+            if self.unsynced >= self.batch_size:
+                self._sync()
+
+    def _sync(self):
+        self.f.flush()
+        os.fsync(self.f.fileno())
+        self.unsynced = 0
+
+    def flush(self):
+        with self.lock:
+            if self.unsynced:
+                self._sync()
+
+    def close(self):
+        with self.lock:
+            if self.f.closed:
+                return
+            self._sync()
+            self.f.close()
+
+
+class DeadLetters:
+    """Requests that still failed after retries, kept in a JSONL file so they can be re-driven on their own"""
+    def __init__(self, path=DEAD_LETTER_PATH):
+        self.path = path
+        self.lock = threading.Lock()
+        self.added = 0
+        self.checked_tail = False
+
+    def add(self, model_name, q, error):
+        entry = {
+            "model_name": model_name,
+            "question_id": question_id(q),
+            "question": q["question"],
+            "image": q["image"],
+            "error_type": type(error).__name__,
+            "error": str(error)[:1000],
+            "time": datetime.now().isoformat(timespec="seconds"),
+        }
+        with self.lock:
+            if not self.checked_tail:
+                drop_torn_tail(self.path)
+                self.checked_tail = True
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            self.added += 1
+
+    def load(self):
+        return list(_read_jsonl(self.path))
+
+    def take(self, model_names):
+        """Remove and return the entries for model_names; entries for other models stay queued"""
+        with self.lock:
+            entries = self.load()
+            taken = [e for e in entries if e["model_name"] in model_names]
+            kept = [e for e in entries if e["model_name"] not in model_names]
+            with open(self.path, "w", encoding="utf-8") as f:
+                for e in kept:
+                    f.write(json.dumps(e, ensure_ascii=False) + "\n")
+            return taken
+
+
+def drop_torn_tail(path):
+    """Truncate a JSONL file back to its last complete line.
+
+    Appending after a torn line would glue the new line onto it, and replay
+    stops at the first line without a newline, so both would be lost.
+    """
+    if not os.path.exists(path):
+        return
+    with open(path, "rb+") as f:
+        end = f.seek(0, os.SEEK_END)
+        pos = end
+        while pos > 0:
+            step = min(65536, pos)
+            f.seek(pos - step)
+            chunk = f.read(step)
+            newline = chunk.rfind(b"\n")
+            if newline >= 0:
+                pos = pos - step + newline + 1
+                break
+            pos -= step
+        if pos < end:
+            f.truncate(pos)
+            f.flush()
+            os.fsync(f.fileno())
+
+
+def _read_jsonl(path):
+    if not os.path.exists(path):
+        return
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            # A crash mid-write leaves a torn last line; everything before it is intact
+            if not line.endswith("\n"):
+                break
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                continue
+
+
+def replay(path=JOURNAL_PATH):
+    """Yield (model_name, result) for every complete line in the journal"""
+    for entry in _read_jsonl(path):
+        yield entry["model_name"], entry["result"]
+
+
+def load_results(results_path=RESULTS_PATH, journal_path=JOURNAL_PATH):
+    """results.json plus everything journaled since the last compaction"""
+    results = {}
+    if os.path.exists(results_path):
+        with open(results_path) as f:
+            results = json.load(f)
+
+    # Entries already in results.json are skipped, in case a crash hit between
+    # writing results.json and truncating the journal
+    index = ResultIndex(results)
+    for name, r in replay(journal_path):
+        if index.has(name, r):
+            continue
+        index.add(name, r)
+        results.setdefault(name, []).append(r)
+    return results
+
+
+def compact(results_path=RESULTS_PATH, journal_path=JOURNAL_PATH):
+    """Fold the journal into results.json and truncate it. Returns the merged results."""
+    results = load_results(results_path, journal_path)
+    tmp_path = results_path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(results, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, results_path)
+    if os.path.exists(journal_path):
+        open(journal_path, "w").close()
+    return results
+
+
+def check():
+    """Failures of a crash/resume round trip through the journal, as printable lines"""
+    results = [{"question": f"q{i}", "image": "x.png", "response": str(i)} for i in range(1, 4)]
+    with tempfile.TemporaryDirectory(prefix="vr_bench_journal_") as tmp:
+        results_path, journal_path = os.path.join(tmp, RESULTS_PATH), os.path.join(tmp, JOURNAL_PATH)
+        journal = ResultsJournal(journal_path)
+        journal.append("m", results[0])
+        journal.close()
+        # A crash mid-write: half a line, no newline
+        with open(journal_path, "a", encoding="utf-8") as f:
+            f.write('{"model_name": "m", "result": {"question": "q')
+        journal = ResultsJournal(journal_path)
+        for r in results[1:]:
+            journal.append("m", r)
+        journal.close()
+        kept = [r["question"] for r in compact(results_path, journal_path).get("m", [])]
+    expected = [r["question"] for r in results]
+    return [] if kept == expected else [f"resume after a torn line kept {kept}, expected {expected}"]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Results journal for run.py')
+    parser.add_argument('--check', action='store_true', help='Run the built-in crash/resume check')
+    args = parser.parse_args()
+
+    if args.check:
+        failures = check()
+        for failure in failures:
+            print(f"FAIL {failure}")
+        print("journal check passed" if not failures else f"{len(failures)} journal checks failed")
+        raise SystemExit(1 if failures else 0)
+    parser.print_help()
@@ -0,0 +1,160 @@
+"""Live latency/throughput counters for a benchmark run.
+
+run.py reports every request start, retry, error and finished result here.
+A background thread appends a snapshot to metrics.jsonl every few seconds:
+in-flight requests, requests/sec, tokens/sec, cost/sec and error rate per
+model. summary() prints the end-of-run table, including per-phase latency
+percentiles, so slowness on our side can be told apart from the provider's.
+"""
+import json, math, threading, time
+from collections import deque
+
+METRICS_PATH = "metrics.jsonl"
+PHASES = ("read", "encode", "queue", "ttfb", "ttft", "network", "total")
+WINDOW = 60.0  # seconds of history behind the "recent" rates
+
+
+def percentile(values, p):
+    """Nearest-rank percentile of an unsorted list (None if empty)"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    k = max(0, min(len(ordered) - 1, math.ceil(p / 100 * len(ordered)) - 1))
+    return ordered[k]
+
+
+class ModelStats:
+    def __init__(self):
+        self.in_flight = self.completed = self.errors = self.retries = self.cache_hits = self.cutoffs = 0
+        self.tokens = 0
+        self.cost = 0.0
+        self.phases = {p: [] for p in PHASES}
+        self.decode_rates = []  # tokens/sec of streamed answers
+        self.recent = deque()  # (finish time, tokens, cost, error)
+
+    def trim(self, now):
+        while self.recent and now - self.recent[0][0] > WINDOW:
+            self.recent.popleft()
+
+
+class RunMetrics:
+    def __init__(self, path=METRICS_PATH, interval=10.0):
+        self.path = path
+        self.interval = interval
+        self.started = time.time()
+        self.models = {}
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def _model(self, name):
+        if name not in self.models:
+            self.models[name] = ModelStats()
+        return self.models[name]
+
+    def start(self, name):
+        with self.lock:
+            self._model(name).in_flight += 1
+
+    def retry(self, name):
+        with self.lock:
+            self._model(name).retries += 1
+
+    def error(self, name):
+        now = time.time()
+        with self.lock:
+            m = self._model(name)
+            m.in_flight -= 1
+            m.errors += 1
+            m.recent.append((now, 0, 0.0, True))
+            m.trim(now)
+
+    def finish(self, name, result):
+        now = time.time()
+        tokens = result.get("tokens") or {}
+        with self.lock:
+            m = self._model(name)
+            m.in_flight -= 1
+            m.completed += 1
+            if result.get("cache_hit"):
+                # Nothing was spent and the timing isn't this run's; keep it out of the rates
+                m.cache_hits += 1
+                return
+            total_tokens, cost = tokens.get("total") or 0, tokens.get("cost") or 0.0
+            m.tokens += total_tokens
+            m.cost += cost
+            m.recent.append((now, total_tokens, cost, False))
+            m.trim(now)
+            stream = result.get("stream") or {}
+            if stream.get("cutoff"):
+                m.cutoffs += 1
+            if stream.get("tokens_per_sec"):
+                m.decode_rates.append(stream["tokens_per_sec"])
+            for phase, value in (result.get("timing") or {}).items():
+                if phase in m.phases and value is not None:
+                    m.phases[phase].append(value)
+
+    def snapshot(self):
+        now = time.time()
+        elapsed = max(now - self.started, 1e-9)
+        window = min(WINDOW, elapsed)
+        models = {}
+        with self.lock:
+            for name, m in self.models.items():
+                m.trim(now)
+                recent_ok = [r for r in m.recent if not r[3]]
+                attempted = m.completed + m.errors
+                models[name] = {
+                    "in_flight": m.in_flight,
+                    "completed": m.completed,
+                    "errors": m.errors,
+                    "retries": m.retries,
+                    "cache_hits": m.cache_hits,
+                    "cutoffs": m.cutoffs,
+                    "requests_per_sec": len(recent_ok) / window,
+                    "tokens_per_sec": sum(r[1] for r in recent_ok) / window,
+                    "cost_per_sec": sum(r[2] for r in recent_ok) / window,
+                    "error_rate": len(m.recent) and (len(m.recent) - len(recent_ok)) / len(m.recent),
+                    "total_error_rate": attempted and m.errors / attempted,
+                    "tokens": m.tokens,
+                    "cost": m.cost,
+                }
+        return {"time": now, "elapsed": elapsed, "models": models}
+
+    def write_snapshot(self):
+        with open(self.path, "a") as f:
+            f.write(json.dumps(self.snapshot()) + "\n")
+
+    def _loop(self):
+        while not self.stop_event.wait(self.interval):
+            self.write_snapshot()
+
+    def start_writer(self):
+        if self.interval and self.interval > 0:
+            self.thread = threading.Thread(target=self._loop, daemon=True)
+            self.thread.start()
+
+    def stop_writer(self):
+        if self.thread is not None:
+            self.stop_event.set()
+            self.thread.join()
+            self.thread = None
+            self.write_snapshot()
+
+    def summary(self):
+        elapsed = time.time() - self.started
+        print(f"\n=== RUN METRICS ({elapsed:.0f}s) ===")
+        with self.lock:
+            for name, m in self.models.items():
+                fresh = m.completed - m.cache_hits
+                cut = f", {m.cutoffs} cut off" if m.cutoffs else ""
+                print(f"[{name}] {m.completed} done ({m.cache_hits} cached{cut}), {m.errors} errors, {m.retries} retries | "
+                      f"{fresh / elapsed:.2f} req/s, {m.tokens / elapsed:.0f} tok/s, ${m.cost:.2f} (${m.cost / elapsed * 3600:.2f}/h)")
+                for phase in PHASES:
+                    values = m.phases[phase]
+                    if values:
+                        print(f"    {phase:<8} p50 {percentile(values, 50):7.2f}s  p95 {percentile(values, 95):7.2f}s  "
+                              f"max {max(values):7.2f}s")
+                if m.decode_rates:
+                    print(f"    decode   p50 {percentile(m.decode_rates, 50):7.1f} tok/s  "
+                          f"p5 {percentile(m.decode_rates, 5):7.1f} tok/s")
@@ -0,0 +1,532 @@
+#!/usr/bin/env python3
+"""Local stand-in for the providers run.py talks to, for load-testing without spending money.
+
+Serves an OpenAI-compatible POST .../chat/completions over HTTP (what `client`
+points at), plus the /files and /batches endpoints run.py --batch uses, and
+optionally the xAI Chat gRPC service (what `xai_client` points at). Responses are drawn from a latency distribution, a share of them can be
+turned into 429s, 500s or malformed JSON, and answers can be replayed from an
+existing results.json. Streamed requests (server-sent events over HTTP,
+GetCompletionChunk over gRPC) get their first token after the sampled latency
+and one token per --token-interval after that; --reasoning-tokens pads
+answers with a long reasoning trace, to exercise run.py's streaming ceilings.
+
+    python3 mock_server.py --port 8765 --xai-port 8766 --latency lognormal:1.5,0.6 --error-429 0.05
+    python3 mock_server.py --token-interval 0.01 --reasoning-tokens 5000     # slow, long-winded answers
+    python3 run.py --openrouter-base-url http://127.0.0.1:8765/v1 --xai-api-host 127.0.0.1:8766
+"""
+import argparse, base64, hashlib, json, math, os, random, threading, time
+from concurrent.futures import ThreadPoolExecutor
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def parse_latency(spec):
+    """Latency spec -> sampler returning seconds.
+
+    fixed:S | uniform:LO,HI | normal:MEAN,SD | lognormal:MEDIAN,SIGMA | exp:MEAN
+    """
+    kind, _, args = spec.partition(":")
+    values = [float(v) for v in args.split(",") if v]
+    if kind == "fixed":
+        return lambda: values[0]
+    if kind == "uniform":
+        return lambda: random.uniform(values[0], values[1])
+    if kind == "normal":
+        return lambda: max(0.0, random.gauss(values[0], values[1]))
+    if kind == "lognormal":
+        return lambda: random.lognormvariate(math.log(values[0]), values[1])
+    if kind == "exp":
+        return lambda: random.expovariate(1 / values[0])
+    raise ValueError(f"Unknown latency distribution {spec!r}")
+
+
+class Replay:
+    """Answers from an existing results.json, looked up by question text and image content hash"""
+    def __init__(self, results_path=None, model_name=None, images_dir="images"):
+        self.by_image = {}
+        self.by_question = {}
+        self.image_names = {}
+        if not results_path:
+            return
+        with open(results_path) as f:
+            results = json.load(f)
+        names = [model_name] if model_name else list(results)
+        for name in names:
+            for r in results.get(name, []):
+                self.by_image.setdefault((r["question"], r["image"]), r)
+                self.by_question.setdefault(r["question"], r)
+        if os.path.isdir(images_dir):
+            for image in {r["image"] for r in self.by_question.values()} | {i for _, i in self.by_image}:
+                path = os.path.join(images_dir, image)
+                if os.path.exists(path):
+                    with open(path, "rb") as f:
+                        self.image_names[hashlib.sha256(f.read()).hexdigest()] = image
+
+    def lookup(self, question, image_url):
+        image = None
+        if image_url and image_url.startswith("data:") and self.image_names:
+            data = image_url.split(",", 1)[1]
+            image = self.image_names.get(hashlib.sha256(base64.b64decode(data)).hexdigest())
+        return self.by_image.get((question, image)) or self.by_question.get(question)
+
+
+class MockProvider:
+    """Shared behaviour of both endpoints: latency, injected errors, answers and counters"""
+    def __init__(self, latency="fixed:0.05", error_429=0.0, error_500=0.0, malformed=0.0,
+                 retry_after=1.0, replay=None, seed=None, token_interval=0.0, reasoning_tokens=0):
+        self.sample_latency = parse_latency(latency)
+        self.error_429 = error_429
+        self.error_500 = error_500
+        self.malformed = malformed
+        self.retry_after = retry_after
+        self.replay = replay or Replay()
+        self.random = random.Random(seed)
+        self.token_interval = token_interval
+        self.reasoning_tokens = reasoning_tokens
+        self.lock = threading.Lock()
+        self.counts = {"requests": 0, "ok": 0, "429": 0, "500": 0, "malformed": 0}
+
+    def outcome(self):
+        """Pick what happens to the next request: ok, 429, 500 or malformed"""
+        with self.lock:
+            self.counts["requests"] += 1
+            r = self.random.random()
+            for name, p in (("429", self.error_429), ("500", self.error_500), ("malformed", self.malformed)):
+                if r < p:
+                    self.counts[name] += 1
+                    return name
+                r -= p
+            self.counts["ok"] += 1
+            return "ok"
+
+    def answer(self, question, image_url, prompt_chars):
+        """(content, reasoning, usage dict) for a question"""
+        r = self.replay.lookup(question, image_url) or {}
+        content = r.get("response") or "42"
+        reasoning = r.get("reasoning")
+        tokens = r.get("tokens") or {}
+        if not reasoning and self.reasoning_tokens:
+            reasoning = ("Let me look at the image once more. " * self.reasoning_tokens)[:4 * self.reasoning_tokens]
+            tokens = {}
+        prompt = tokens.get("prompt") or max(1, prompt_chars // 4)
+        completion = tokens.get("completion") or max(1, len(content) // 4 + len(reasoning or "") // 4)
+        usage = {
+            "prompt_tokens": prompt,
+            "completion_tokens": completion,
+            "total_tokens": prompt + completion,
+            "cost": tokens.get("cost") if tokens.get("cost") is not None else (prompt + 4 * completion) * 1e-6,
+        }
+        if tokens.get("reasoning"):
+            usage["completion_tokens_details"] = {"reasoning_tokens": tokens["reasoning"]}
+        return content, reasoning, usage
+
+    def generation_time(self, content, reasoning):
+        """How long producing an answer takes beyond the first token, at token_interval per token"""
+        return self.token_interval * (len(pieces(content)) + len(pieces(reasoning or "")))
+
+    def stream_pause(self):
+        if self.token_interval:
+            time.sleep(self.token_interval)
+
+
+def pieces(text, size=4):
+    """text as the roughly one-token deltas a stream sends"""
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+def read_openai_request(body):
+    """Question text, image URL and total prompt size from a chat.completions request body"""
+    question = image_url = None
+    prompt_chars = 0
+    for message in body.get("messages", []):
+        content = message.get("content")
+        if isinstance(content, str):
+            prompt_chars += len(content)
+            continue
+        for part in content or []:
+            if part.get("type") == "text":
+                question = part["text"]
+                prompt_chars += len(part["text"])
+            elif part.get("type") == "image_url":
+                image_url = part["image_url"]["url"]
+                prompt_chars += 1000  # roughly what providers bill for a high-detail image
+    return question, image_url, prompt_chars
+
+
+def chat_error(provider):
+    """Wait the sampled latency, then (status, payload, headers, raw body) if this request gets an error, else None"""
+    time.sleep(provider.sample_latency())
+    outcome = provider.outcome()
+    if outcome == "429":
+        return 429, {"error": {"message": "Rate limit exceeded", "code": 429}}, {"Retry-After": str(provider.retry_after)}, None
+    if outcome == "500":
+        return 500, {"error": {"message": "Internal server error", "code": 500}}, None, None
+    if outcome == "malformed":
+        # Like an upstream HTML error page served as JSON: "Expecting value" on the client
+        return 200, None, None, b"<html><body>502 Bad Gateway</body></html>"
+    return None
+
+
+def chat_completion(provider, body):
+    """(status, payload, headers, raw body) for one chat.completions request, after the sampled latency"""
+    error = chat_error(provider)
+    if error:
+        return error
+
+    question, image_url, prompt_chars = read_openai_request(body)
+    content, reasoning, usage = provider.answer(question, image_url, prompt_chars)
+    time.sleep(provider.generation_time(content, reasoning))
+    message = {"role": "assistant", "content": content}
+    if reasoning:
+        message["reasoning"] = reasoning
+    return 200, {
+        "id": f"mock-{time.time_ns()}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model"),
+        "choices": [{"index": 0, "message": message, "finish_reason": "stop"}],
+        "usage": usage,
+    }, None, None
+
+
+def completion_chunks(provider, body):
+    """The chat.completion.chunk payloads of a streamed answer, yielded as they are generated"""
+    question, image_url, prompt_chars = read_openai_request(body)
+    content, reasoning, usage = provider.answer(question, image_url, prompt_chars)
+    base = {"id": f"mock-{time.time_ns()}", "object": "chat.completion.chunk", "created": int(time.time()),
+            "model": body.get("model")}
+
+    def chunk(delta, finish_reason=None):
+        return dict(base, choices=[{"index": 0, "delta": delta, "finish_reason": finish_reason}])
+
+    yield chunk({"role": "assistant", "content": ""})
+    for piece in pieces(reasoning or ""):
+        provider.stream_pause()
+        yield chunk({"reasoning": piece})
+    for piece in pieces(content):
+        provider.stream_pause()
+        yield chunk({"content": piece})
+    yield chunk({}, "stop")
+    # OpenRouter sends usage on streams that ask for it either way
+    if (body.get("stream_options") or {}).get("include_usage") or (body.get("usage") or {}).get("include"):
+        yield dict(base, choices=[], usage=usage)
+
+
+class MockBatches:
+    """The /files and /batches endpoints: batches run through chat_completion on a thread pool"""
+    def __init__(self, provider, workers=16):
+        self.provider = provider
+        self.workers = workers
+        self.lock = threading.Lock()
+        self.files = {}  # id -> (file object, bytes)
+        self.batches = {}
+
+    def add_file(self, data, filename="batch.jsonl", purpose="batch"):
+        file_id = f"file-mock-{time.time_ns()}"
+        obj = {"id": file_id, "object": "file", "bytes": len(data), "created_at": int(time.time()),
+               "filename": filename, "purpose": purpose, "status": "processed"}
+        with self.lock:
+            self.files[file_id] = (obj, data)
+        return obj
+
+    def file_content(self, file_id):
+        with self.lock:
+            entry = self.files.get(file_id)
+        return entry[1] if entry else None
+
+    def create(self, body):
+        data = self.file_content(body.get("input_file_id"))
+        if data is None:
+            return None
+        lines = [json.loads(line) for line in data.splitlines() if line.strip()]
+        batch_id = f"batch-mock-{time.time_ns()}"
+        batch = {"id": batch_id, "object": "batch", "endpoint": body.get("endpoint"),
+                 "input_file_id": body["input_file_id"], "completion_window": body.get("completion_window", "24h"),
+                 "status": "validating", "created_at": int(time.time()), "metadata": body.get("metadata"),
+                 "output_file_id": None, "error_file_id": None, "errors": None,
+                 "request_counts": {"total": len(lines), "completed": 0, "failed": 0}}
+        with self.lock:
+            self.batches[batch_id] = batch
+        threading.Thread(target=self._run, args=(batch, lines), daemon=True).start()
+        return batch
+
+    def get(self, batch_id):
+        with self.lock:
+            batch = self.batches.get(batch_id)
+            return json.loads(json.dumps(batch)) if batch else None
+
+    def _run(self, batch, lines):
+        with self.lock:
+            batch["status"] = "in_progress"
+            batch["in_progress_at"] = int(time.time())
+
+        def one(line):
+            status, payload, _, raw = chat_completion(self.provider, line["body"])
+            if raw is not None:
+                status, payload = 500, {"error": {"message": "Malformed upstream response", "code": 500}}
+            out = {"id": f"batch-req-{time.time_ns()}", "custom_id": line["custom_id"],
+                   "response": {"status_code": status, "request_id": f"req-{time.time_ns()}", "body": payload},
+                   "error": None}
+            with self.lock:
+                batch["request_counts"]["completed" if status == 200 else "failed"] += 1
+            return status, out
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            outputs = list(pool.map(one, lines))
+        ok = b"".join(json.dumps(o).encode() + b"\n" for status, o in outputs if status == 200)
+        failed = b"".join(json.dumps(o).encode() + b"\n" for status, o in outputs if status != 200)
+        output_file = self.add_file(ok, "batch_output.jsonl", "batch_output")
+        error_file = self.add_file(failed, "batch_errors.jsonl", "batch_output") if failed else None
+        with self.lock:
+            batch["output_file_id"] = output_file["id"]
+            batch["error_file_id"] = error_file["id"] if error_file else None
+            batch["status"] = "completed"
+            batch["completed_at"] = int(time.time())
+
+
+def parse_multipart(content_type, data):
+    """{field name: (filename, bytes)} from a multipart/form-data body"""
+    message = BytesParser(policy=HTTP).parsebytes(f"Content-Type: {content_type}\r\n\r\n".encode() + data)
+    return {part.get_param("name", header="content-disposition"): (part.get_filename(), part.get_payload(decode=True))
+            for part in message.iter_parts()}
+
+
+def make_handler(provider, batches=None):
+    batches = batches or MockBatches(provider)
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def send_json(self, status, payload, headers=None, raw=None):
+            data = raw if raw is not None else json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            for k, v in (headers or {}).items():
+                self.send_header(k, v)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def send_events(self, events):
+            """Server-sent events, one per chunk of a chunked response; a client hanging up (a cutoff) ends it"""
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            try:
+                for event in events:
+                    data = event if isinstance(event, str) else json.dumps(event)
+                    self.write_chunk(f"data: {data}\n\n".encode("utf-8"))
+                self.write_chunk(b"data: [DONE]\n\n")
+                self.wfile.write(b"0\r\n\r\n")
+            except (BrokenPipeError, ConnectionResetError):
+                self.close_connection = True
+
+        def write_chunk(self, data):
+            self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+
+        def read_body(self):
+            if self.headers.get("Transfer-Encoding", "").lower() == "chunked":
+                chunks = []
+                while True:
+                    size = int(self.rfile.readline().split(b";")[0].strip(), 16)
+                    if size == 0:
+                        self.rfile.readline()
+                        return b"".join(chunks)
+                    chunks.append(self.rfile.read(size))
+                    self.rfile.readline()
+            return self.rfile.read(int(self.headers.get("Content-Length") or 0))
+
+        def not_found(self):
+            self.send_json(404, {"error": {"message": f"No route for {self.path}"}})
+
+        def do_POST(self):
+            data = self.read_body()
+            path = self.path.rstrip("/")
+            if path.endswith("/files"):
+                fields = parse_multipart(self.headers.get("Content-Type", ""), data)
+                filename, content = fields.get("file", (None, b""))
+                purpose = (fields.get("purpose") or (None, b"batch"))[1].decode()
+                self.send_json(200, batches.add_file(content, filename or "upload.jsonl", purpose))
+                return
+            body = json.loads(data or b"{}")
+            if path.endswith("/batches"):
+                batch = batches.create(body)
+                if batch is None:
+                    self.send_json(400, {"error": {"message": "Unknown input_file_id"}})
+                else:
+                    self.send_json(200, batch)
+                return
+            if not path.endswith("/chat/completions"):
+                self.not_found()
+                return
+
+            if body.get("stream"):
+                error = chat_error(provider)
+                if error is None:
+                    self.send_events(completion_chunks(provider, body))
+                elif error[3] is not None:
+                    # Garbage mid-stream: the client fails to parse the event, as it would a malformed body
+                    self.send_events([error[3].decode()])
+                else:
+                    self.send_json(error[0], error[1], headers=error[2])
+                return
+            status, payload, headers, raw = chat_completion(provider, body)
+            self.send_json(status, payload, headers=headers, raw=raw)
+
+        def do_GET(self):
+            parts = self.path.split("?")[0].rstrip("/").split("/")
+            if len(parts) >= 2 and parts[-2] == "batches":
+                batch = batches.get(parts[-1])
+                self.send_json(200, batch) if batch else self.not_found()
+                return
+            if len(parts) >= 3 and parts[-3] == "files" and parts[-1] == "content":
+                content = batches.file_content(parts[-2])
+                if content is None:
+                    self.not_found()
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", "application/octet-stream")
+                self.send_header("Content-Length", str(len(content)))
+                self.end_headers()
+                self.wfile.write(content)
+                return
+            self.not_found()
+
+    return Handler
+
+
+def serve_openai(provider, host="127.0.0.1", port=8765):
+    """Start the HTTP endpoint in a background thread; returns the server (call .shutdown() to stop)"""
+    server = ThreadingHTTPServer((host, port), make_handler(provider))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def serve_xai(provider, host="127.0.0.1", port=8766, workers=64):
+    """Start a stand-in for the xAI Chat gRPC service; returns the grpc server (call .stop(0) to stop)"""
+    import grpc
+    from xai_sdk.proto import chat_pb2, chat_pb2_grpc, usage_pb2
+
+    def start(context):
+        """Wait the sampled latency and abort with an injected error, if this request gets one"""
+        time.sleep(provider.sample_latency())
+        outcome = provider.outcome()
+        if outcome == "429":
+            context.abort(grpc.StatusCode.RESOURCE_EXHAUSTED, "Rate limit exceeded")
+        if outcome in ("500", "malformed"):
+            context.abort(grpc.StatusCode.UNAVAILABLE, "Upstream unavailable")
+
+    def answer(request):
+        question = image_url = None
+        prompt_chars = 0
+        for message in request.messages:
+            for part in message.content:
+                if part.text:
+                    question = part.text
+                    prompt_chars += len(part.text)
+                if part.image_url.image_url:
+                    image_url = part.image_url.image_url
+                    prompt_chars += 1000
+        return provider.answer(question, image_url, prompt_chars)
+
+    def sampling_usage(usage):
+        return usage_pb2.SamplingUsage(
+            prompt_tokens=usage["prompt_tokens"],
+            completion_tokens=usage["completion_tokens"],
+            total_tokens=usage["total_tokens"],
+            reasoning_tokens=(usage.get("completion_tokens_details") or {}).get("reasoning_tokens", 0),
+            cost_in_usd_ticks=int(round(usage["cost"] / 1e-10)),
+        )
+
+    class ChatServicer(chat_pb2_grpc.ChatServicer):
+        def GetCompletion(self, request, context):
+            start(context)
+            content, reasoning, usage = answer(request)
+            time.sleep(provider.generation_time(content, reasoning))
+            return chat_pb2.GetChatCompletionResponse(
+                id=f"mock-{time.time_ns()}",
+                model=request.model,
+                outputs=[chat_pb2.CompletionOutput(
+                    index=0,
+                    finish_reason="REASON_STOP",
+                    message=chat_pb2.CompletionMessage(content=content, reasoning_content=reasoning or "",
+                                                       role="ROLE_ASSISTANT"),
+                )],
+                usage=sampling_usage(usage),
+            )
+
+        def GetCompletionChunk(self, request, context):
+            start(context)
+            content, reasoning, usage = answer(request)
+            chunk_id = f"mock-{time.time_ns()}"
+
+            def chunk(finish_reason=None, usage=None, **delta):
+                output = chat_pb2.CompletionOutputChunk(index=0, delta=chat_pb2.Delta(role="ROLE_ASSISTANT", **delta),
+                                                        finish_reason=finish_reason)
+                return chat_pb2.GetChatCompletionChunk(id=chunk_id, model=request.model, outputs=[output], usage=usage)
+
+            deltas = [{"reasoning_content": p} for p in pieces(reasoning or "")] + [{"content": p} for p in pieces(content)]
+            for delta in deltas:
+                if not context.is_active():  # the client cut the stream off
+                    return
+                provider.stream_pause()
+                yield chunk(**delta)
+            yield chunk("REASON_STOP", sampling_usage(usage))
+
+    # Full-resolution images exceed gRPC's default 4 MB message cap, as they would on the real API
+    server = grpc.server(ThreadPoolExecutor(max_workers=workers),
+                         options=[("grpc.max_receive_message_length", 64 * 1024 * 1024)])
+    chat_pb2_grpc.add_ChatServicer_to_server(ChatServicer(), server)
+    server.add_insecure_port(f"{host}:{port}")
+    server.start()
+    return server
+
+
+def add_provider_args(parser):
+    parser.add_argument('--latency', default='fixed:0.05',
+                        help='fixed:S, uniform:LO,HI, normal:MEAN,SD, lognormal:MEDIAN,SIGMA or exp:MEAN (seconds)')
+    parser.add_argument('--error-429', type=float, default=0.0, help='Share of requests answered with 429')
+    parser.add_argument('--error-500', type=float, default=0.0, help='Share of requests answered with 500')
+    parser.add_argument('--malformed', type=float, default=0.0, help='Share of requests answered with invalid JSON')
+    parser.add_argument('--retry-after', type=float, default=1.0, help='Retry-After seconds sent with 429s')
+    parser.add_argument('--replay', help='results.json to replay answers from')
+    parser.add_argument('--replay-model', help='Model in the replay file to take answers from (default: any)')
+    parser.add_argument('--seed', type=int, help='Seed for error injection')
+    parser.add_argument('--token-interval', type=float, default=0.0,
+                        help='Seconds per generated token after the first (streamed or not)')
+    parser.add_argument('--reasoning-tokens', type=int, default=0,
+                        help='Give answers without a replayed reasoning trace a made-up one of this many tokens')
+
+
+def provider_from_args(args):
+    return MockProvider(args.latency, args.error_429, args.error_500, args.malformed, args.retry_after,
+                        Replay(args.replay, args.replay_model), args.seed, args.token_interval, args.reasoning_tokens)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Mock OpenRouter/xAI endpoints for load-testing run.py')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765, help='OpenAI-compatible HTTP port')
+    parser.add_argument('--xai-port', type=int, help='Also serve the xAI gRPC API on this port')
+    add_provider_args(parser)
+    args = parser.parse_args()
+
+    provider = provider_from_args(args)
+    servers = [serve_openai(provider, args.host, args.port)]
+    print(f"OpenAI-compatible endpoint: http://{args.host}:{args.port}/v1")
+    if args.xai_port:
+        # Keep a reference: a grpc server that gets garbage collected stops serving
+        servers.append(serve_xai(provider, args.host, args.xai_port))
+        print(f"xAI endpoint: {args.host}:{args.xai_port} (insecure)")
+    try:
+        while True:
+            time.sleep(10)
+            print(provider.counts)
+    except KeyboardInterrupt:
+        pass
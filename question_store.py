@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""Indexed access to questions.json.
+
+Every question gets a stable id (journal.question_id: a hash of its text and
+image) and its byte span in questions.json. Secondary indexes on tags, type,
+domain and image map each value to question positions. The index is kept in
+.questions_index.json and rebuilt only when questions.json changes, so
+selecting a subset reads the small index plus the selected questions, never
+the whole corpus.
+
+    python3 question_store.py "tags=Spatial,domain=sports"      # AND across fields
+    python3 question_store.py "tags=Spatial|Reasoning" --sample 3 # OR within a field, 3 per tag
+"""
+import argparse, json, os, random
+from collections import defaultdict
+
+from journal import question_id
+
+QUESTIONS_PATH = "questions.json"
+INDEX_PATH = ".questions_index.json"
+INDEX_VERSION = 1
+FIELDS = ("tags", "type", "domain", "image")
+
+
+def _values(q, field):
+    """Index keys of a question for a field: lowercased, None as ''"""
+    value = q.get(field)
+    values = value if isinstance(value, list) else [value]
+    return [str(v or "").lower() for v in values]
+
+
+def parse_query(spec):
+    """'tags=Spatial|Reasoning,domain=sports' -> {"tags": {"spatial", "reasoning"}, "domain": {"sports"}}"""
+    query = {}
+    for clause in filter(None, (c.strip() for c in (spec or "").split(","))):
+        field, sep, values = clause.partition("=")
+        field = field.strip().lower()
+        if not sep or field not in FIELDS + ("id",):
+            raise ValueError(f"Bad question query {clause!r}: use FIELD=VALUE with FIELD one of {', '.join(FIELDS + ('id',))}")
+        query.setdefault(field, set()).update(v.strip().lower() for v in values.split("|"))
+    return query
+
+
+class QuestionStore:
+    def __init__(self, path=QUESTIONS_PATH, index_path=INDEX_PATH):
+        self.path = path
+        self.index_path = index_path
+        self._load_index()
+
+    def _source(self):
+        st = os.stat(self.path)
+        return {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+    def _load_index(self):
+        source = self._source()
+        if os.path.exists(self.index_path):
+            try:
+                with open(self.index_path) as f:
+                    index = json.load(f)
+                if index.get("version") == INDEX_VERSION and index.get("source") == source:
+                    self._use(index)
+                    return
+            except (json.JSONDecodeError, KeyError):
+                pass
+        self._use(self.build(source))
+
+    def _use(self, index):
+        self.ids = index["ids"]
+        self.spans = index["spans"]
+        self.fields = index["fields"]
+        self.positions = {}
+        for pos, qid in enumerate(self.ids):
+            # Duplicated questions share an id; the first one stands for it
+            self.positions.setdefault(qid, pos)
+
+    def build(self, source=None):
+        """Scan questions.json once for each question's byte span, id and field values; save the index"""
+        with open(self.path, "rb") as f:
+            raw = f.read()
+        text = raw.decode("utf-8")
+        decoder = json.JSONDecoder()
+        ids, spans = [], []
+        fields = {field: defaultdict(list) for field in FIELDS}
+        pos = text.index("[") + 1
+        # Character offsets map to byte offsets only for ASCII, so track bytes separately
+        byte_pos = len(text[:pos].encode("utf-8"))
+        while True:
+            while text[pos] in " \t\r\n,":
+                byte_pos += 1
+                pos += 1
+            if text[pos] == "]":
+                break
+            q, end = decoder.raw_decode(text, pos)
+            length = len(text[pos:end].encode("utf-8"))
+            spans.append([byte_pos, length])
+            ids.append(question_id(q))
+            for field in FIELDS:
+                for value in _values(q, field):
+                    fields[field][value].append(len(ids) - 1)
+            byte_pos += length
+            pos = end
+
+        index = {"version": INDEX_VERSION, "source": source or self._source(), "ids": ids, "spans": spans,
+                 "fields": {field: dict(values) for field, values in fields.items()}}
+        tmp_path = self.index_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(index, f, separators=(",", ":"))
+        os.replace(tmp_path, self.index_path)
+        return index
+
+    def __len__(self):
+        return len(self.ids)
+
+    def load(self, positions):
+        """The questions at these positions, each parsed from its own byte span"""
+        with open(self.path, "rb") as f:
+            out = []
+            for pos in positions:
+                offset, length = self.spans[pos]
+                f.seek(offset)
+                out.append(json.loads(f.read(length)))
+            return out
+
+    def get(self, qid):
+        return self.load([self.positions[qid]])[0]
+
+    def all(self):
+        return self.load(range(len(self.ids)))
+
+    def query(self, spec):
+        """Sorted positions matching a query (see parse_query); an empty query matches everything"""
+        matched = set(range(len(self.ids)))
+        for field, values in parse_query(spec).items():
+            if field == "id":
+                hits = {self.positions[v] for v in values if v in self.positions}
+            else:
+                hits = set()
+                for value in values:
+                    hits.update(self.fields[field].get(value, ()))
+            matched &= hits
+        return sorted(matched)
+
+    def sample(self, positions, per_stratum, field="tags", seed=0):
+        """A random sample of positions with up to per_stratum from each value of field, in corpus order"""
+        rng = random.Random(seed)
+        allowed = set(positions)
+        picked = set()
+        for value in sorted(self.fields[field]):
+            candidates = [p for p in self.fields[field][value] if p in allowed and p not in picked]
+            picked.update(rng.sample(candidates, min(per_stratum, len(candidates))))
+        return sorted(picked)
+
+    def select(self, spec=None, per_stratum=None, limit=None, seed=0):
+        """Questions for a run: those matching spec, optionally a stratified sample of them, at most limit"""
+        positions = self.query(spec)
+        if per_stratum:
+            positions = self.sample(positions, per_stratum, seed=seed)
+        return self.load(positions[:limit])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Query questions.json through its index')
+    parser.add_argument('query', nargs='?', default='', help='e.g. "tags=Spatial,domain=sports" (default: all)')
+    parser.add_argument('--sample', type=int, help='Random sample of this many questions per tag')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--rebuild', action='store_true', help='Rebuild the index even if it looks current')
+    args = parser.parse_args()
+
+    store = QuestionStore()
+    if args.rebuild:
+        store._use(store.build())
+    try:
+        selected = store.select(args.query, args.sample, seed=args.seed)
+    except ValueError as e:
+        parser.error(str(e))
+    for q in selected:
+        print(f"{question_id(q)}  {q['image']:<28} {'|'.join(q.get('tags') or []):<28} {q['question'][:70]}")
@@ -0,0 +1,154 @@
+"""Per-provider rate limiting and retry policy for run.py.
+
+Each provider gets a token bucket for requests/min and, optionally, one for
+tokens/min. A 429 halves the allowed rate and pauses the provider until its
+Retry-After has passed; the rate then creeps back up as requests succeed.
+Transient failures (429, 5xx, timeouts, dropped connections, malformed JSON)
+are retried with jittered exponential backoff.
+"""
+import asyncio, json, random, threading, time
+from email.utils import parsedate_to_datetime
+
+MAX_RETRIES = 5
+BACKOFF_BASE = 2.0
+BACKOFF_CAP = 120.0
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504, 520, 522, 524, 529}
+RETRYABLE_GRPC = {"RESOURCE_EXHAUSTED", "UNAVAILABLE", "DEADLINE_EXCEEDED", "INTERNAL", "ABORTED"}
+
+
+class TokenBucket:
+    """Refills at limit/min up to 10 seconds' worth. Callers reserve first and sleep off any debt."""
+    def __init__(self, per_minute):
+        self.base_rate = per_minute / 60.0
+        self.rate = self.base_rate
+        self.capacity = max(1.0, self.base_rate * 10)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, amount, now):
+        """Take amount now, returning how long to wait before it is actually available"""
+        self._refill(now)
+        self.tokens -= amount
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def refund(self, amount):
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+
+class ProviderLimiter:
+    def __init__(self, name, rpm=None, tpm=None, tokens_per_request=2000):
+        self.name = name
+        self.requests = TokenBucket(rpm) if rpm else None
+        self.tokens = TokenBucket(tpm) if tpm else None
+        self.scale = 1.0
+        self.paused_until = 0.0
+        self.avg_tokens = tokens_per_request
+        self.lock = threading.Lock()
+
+    def _reserve(self):
+        """Reserve one request plus its estimated tokens; returns (delay, token estimate)"""
+        with self.lock:
+            now = time.monotonic()
+            delay = max(0.0, self.paused_until - now)
+            estimate = self.avg_tokens
+            if self.requests:
+                delay = max(delay, self.requests.reserve(1, now))
+            if self.tokens:
+                delay = max(delay, self.tokens.reserve(estimate, now))
+            return delay, estimate
+
+    def acquire(self):
+        delay, estimate = self._reserve()
+        if delay > 0:
+            time.sleep(delay)
+        return estimate
+
+    async def acquire_async(self):
+        delay, estimate = self._reserve()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return estimate
+
+    def _set_scale(self, scale):
+        self.scale = scale
+        for bucket in (self.requests, self.tokens):
+            if bucket:
+                bucket.rate = bucket.base_rate * scale
+
+    def on_success(self, tokens_used, estimate):
+        with self.lock:
+            if tokens_used:
+                self.avg_tokens = 0.9 * self.avg_tokens + 0.1 * tokens_used
+                if self.tokens:
+                    # Settle the reservation against what the request really used
+                    self.tokens.refund(estimate - tokens_used)
+            if self.scale < 1.0:
+                self._set_scale(min(1.0, self.scale + 0.05))
+
+    def on_rate_limited(self, retry_after=None):
+        with self.lock:
+            self._set_scale(max(0.05, self.scale * 0.5))
+            pause = retry_after if retry_after is not None else BACKOFF_BASE
+            self.paused_until = max(self.paused_until, time.monotonic() + pause)
+
+
+class RetryDecision:
+    def __init__(self, retryable, rate_limited=False, retry_after=None):
+        self.retryable = retryable
+        self.rate_limited = rate_limited
+        self.retry_after = retry_after
+
+
+def parse_retry_after(headers):
+    if not headers:
+        return None
+    if headers.get("retry-after-ms"):
+        try:
+            return float(headers["retry-after-ms"]) / 1000
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def classify_error(e):
+    """Decide whether a failed request is worth retrying"""
+    import openai  # deferred: it takes about a second to import, and run.py only needs it once a request is made
+    if isinstance(e, openai.APIStatusError):
+        retry_after = parse_retry_after(e.response.headers if e.response is not None else None)
+        return RetryDecision(e.status_code in RETRYABLE_STATUS, e.status_code == 429, retry_after)
+    if isinstance(e, (openai.APIConnectionError, openai.APITimeoutError)):
+        return RetryDecision(True)
+    if isinstance(e, json.JSONDecodeError) or "Expecting value" in str(e):
+        return RetryDecision(True)
+    # grpc.RpcError from the xAI SDK
+    code = getattr(e, "code", None)
+    if callable(code):
+        try:
+            name = code().name
+        except Exception:
+            name = None
+        # RESOURCE_EXHAUSTED also covers oversized messages, which no amount of waiting fixes
+        if name == "RESOURCE_EXHAUSTED" and "larger than max" in str(e):
+            return RetryDecision(False)
+        if name in RETRYABLE_GRPC:
+            return RetryDecision(True, name == "RESOURCE_EXHAUSTED")
+    return RetryDecision(False)
+
+
+def backoff_delay(attempt, retry_after=None):
+    delay = min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt) * random.uniform(0.5, 1.0)
+    return max(delay, retry_after or 0.0)
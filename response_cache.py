@@ -0,0 +1,76 @@
+"""On-disk cache of model responses keyed by a fingerprint of the exact request.
+
+Re-running a config with the same model, prompt, image and reasoning settings
+at temperature 0 reuses the stored answer instead of paying for the call again.
+Entries live in a SQLite file, expire after a TTL, and the least recently used
+ones are evicted once the cache grows past its size cap.
+"""
+import hashlib, json, sqlite3, threading, time
+
+CACHE_PATH = ".response_cache.sqlite3"
+
+
+def request_fingerprint(request):
+    """Stable hash of a JSON-serializable request description"""
+    return hashlib.sha256(json.dumps(request, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    def __init__(self, path=CACHE_PATH, max_bytes=1024 * 1024 * 1024, ttl_seconds=30 * 86400):
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.lock = threading.Lock()
+        self.hits = self.misses = 0
+        self.db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute("""CREATE TABLE IF NOT EXISTS responses (
+            key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL,
+            created REAL NOT NULL, accessed REAL NOT NULL)""")
+        self.db.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)")
+        self.bytes = self.db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    def get(self, key):
+        now = time.time()
+        with self.lock:
+            row = self.db.execute("SELECT value, size, created FROM responses WHERE key = ?", (key,)).fetchone()
+            if row and self.ttl_seconds and now - row[2] > self.ttl_seconds:
+                self.db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self.bytes -= row[1]
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            self.db.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+            self.hits += 1
+        entry = json.loads(row[0])
+        entry["cached_at"] = row[2]
+        return entry
+
+    def put(self, key, entry):
+        value = json.dumps(entry, ensure_ascii=False)
+        now = time.time()
+        with self.lock:
+            old = self.db.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            self.db.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)",
+                            (key, value, len(value), now, now))
+            self.bytes += len(value) - (old[0] if old else 0)
+            self._evict()
+
+    def _evict(self):
+        while self.bytes > self.max_bytes:
+            rows = self.db.execute("SELECT key, size FROM responses ORDER BY accessed LIMIT 64").fetchall()
+            if not rows:
+                break
+            for key, size in rows:
+                self.db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self.bytes -= size
+                if self.bytes <= self.max_bytes:
+                    break
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "bytes": self.bytes}
+
+    def close(self):
+        with self.lock:
+            self.db.close()
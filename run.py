@@ -1,13 +1,16 @@
-import json, base64, time, os, mimetypes, threading
+import time, os, threading, argparse, asyncio, tempfile
+from types import SimpleNamespace
 from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from openai import OpenAI
-from dotenv import load_dotenv
-from xai_sdk import Client as XAIClient
-from xai_sdk.chat import user, system, image
-
-with open("questions.json") as f:
-    questions = json.load(f)
+from journal import ResultsJournal, ResultIndex, DeadLetters, load_results, compact, question_id
+from image_cache import ImageCache, guess_mime_type
+from response_cache import ResponseCache, request_fingerprint
+from rate_limit import ProviderLimiter, classify_error, backoff_delay, MAX_RETRIES
+from metrics import RunMetrics
+from budget import Budget, WAIT, stratified_order
+from scoring import clean_response, normalize
+from question_store import QuestionStore
+import batch, streaming
 
 # SETTINGS
 SYS_PROMPT = """
@@ -40,144 +43,1014 @@ MODELS = [
     # Batch 3
     {"name": "x-ai/grok-4-high-detail", "model": "x-ai/grok-4"},
     {"name": "openai/gpt-5-high-detail", "model": "openai/gpt-5"},
+
+    # Optional "image" key resizes/recompresses images before sending (see image_prep.py), e.g.
+    # {"name": "openai/gpt-5-1568px", "model": "openai/gpt-5", "image": {"max_edge": 1568, "format": "jpeg", "quality": 85}},
+    # Optional "max_cost" (USD) caps what this model may spend across the sweep, e.g.
+    # {"name": "anthropic/claude-opus-4.1", "model": "anthropic/claude-opus-4.1", "max_cost": 40},
+    # Optional "samples" asks every question k times in parallel and keeps the majority answer plus all k, e.g.
+    # {"name": "openai/gpt-5-x5", "model": "openai/gpt-5", "samples": 5},
+    # Optional "stream" streams this model's answers even without --stream, and "max_seconds" / "max_stream_tokens"
+    # override the ceilings below, e.g.
+    # {"name": "google/gemini-2.5-pro", "model": "google/gemini-2.5-pro", "stream": True, "max_seconds": 600},
 ]
+# Async mode (--mode async): requests kept in flight per model, and the cap per provider across all models
+PER_MODEL_CONCURRENCY = 8
+PROVIDER_CONCURRENCY = {"openrouter": 32, "xai": 16}
+# Encoded images are cached by content hash, shared across models; set a dir to keep them across runs
+IMAGE_CACHE_MB = 512
+IMAGE_CACHE_DIR = None
+PREP_WORKERS = None  # processes for resizing images; None = one per CPU
+# Identical requests (model, prompt, image, reasoning settings) reuse the cached answer; --no-response-cache to bypass
+RESPONSE_CACHE_MB = 1024
+RESPONSE_CACHE_TTL_DAYS = 30
+# Token buckets per provider (None = unlimited); 429s and Retry-After slow them down further
+PROVIDER_LIMITS = {"openrouter": {"rpm": 600, "tpm": None}, "xai": {"rpm": 480, "tpm": None}}
+# Live counters are appended to metrics.jsonl this often (seconds); 0 disables the file
+METRICS_INTERVAL = 10
+# Spending caps in USD (None = no cap). Per-model caps come from "max_cost" in MODELS, else MODEL_BUDGET
+BUDGET = None
+MODEL_BUDGET = None
+# Questions per tag and per domain run first, so cost estimates cover every kind of question early
+SAMPLE_PER_STRATUM = 2
+# Streamed requests (--stream) record time to first token and tokens/sec, and stop at these ceilings (None = none),
+# keeping the partial answer and reasoning: seconds from sending, and streamed tokens (content + reasoning)
+STREAM = False
+MAX_SECONDS = None
+MAX_STREAM_TOKENS = None
 
-questions = questions[:MAX_QUESTIONS]
-load_dotenv()
-API_KEY = os.getenv("OPENROUTER_API_KEY")
-XAI_API_KEY=os.getenv("XAI_API_KEY")
-client = OpenAI(base_url="https://openrouter.ai/api/v1", api_key=API_KEY)
-xai_client = XAIClient(api_key=XAI_API_KEY, timeout=3600)
+OPENROUTER_BASE_URL = "https://openrouter.ai/api/v1"
+XAI_API_HOST = "api.x.ai"
+XAI_TIMEOUT = 3600
+# Where requests go; main() points these elsewhere for --openrouter-base-url / --xai-api-host (e.g. mock_server.py)
+openrouter_base_url = OPENROUTER_BASE_URL
+xai_connection = {"api_host": XAI_API_HOST, "use_insecure_channel": False}
+# Importing run.py has no side effects: questions.json, .env and the clients (openai and xai_sdk take seconds to
+# import) are all loaded on first use, so --help, --status and --compact stay fast
+question_store = None  # see open_question_store()
+client = None  # see openrouter_client()
+xai_clients = {}  # gRPC deadline in seconds -> client, see xai_client_for()
 all_results = {}
 results_lock = threading.Lock()
+result_index = ResultIndex()
+image_cache = ImageCache(IMAGE_CACHE_MB * 1024 * 1024, IMAGE_CACHE_DIR)
+response_cache = None
+limiters = {p: ProviderLimiter(p, **limits) for p, limits in PROVIDER_LIMITS.items()}
+max_retries = MAX_RETRIES
+dead_letters = DeadLetters()
+metrics = RunMetrics(interval=0)
+budget = Budget()
+journal = None
+stream_requests = STREAM
+max_seconds = MAX_SECONDS
+max_stream_tokens = MAX_STREAM_TOKENS
+clients_lock = threading.Lock()
+
+
+def open_question_store():
+    global question_store
+    if question_store is None:
+        question_store = QuestionStore()
+    return question_store
+
+
+def load_questions():
+    """The questions to run, read from questions.json on first use unless main() or a caller already set them"""
+    global questions
+    if "questions" not in globals():
+        questions = open_question_store().select(limit=MAX_QUESTIONS)
+    return questions
+
+
+def __getattr__(name):
+    # run.questions for importers (e.g. bench_runner.py), loaded only when asked for
+    if name == "questions":
+        return load_questions()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def api_key(env_var):
+    from dotenv import load_dotenv
+    load_dotenv()
+    return os.getenv(env_var)
+
+
+def openrouter_client():
+    """The OpenRouter client, created on first use"""
+    global client
+    if client is None:
+        with clients_lock:
+            if client is None:
+                from openai import OpenAI
+                # Retries are handled by call_with_retries so they go through the rate limiter
+                client = OpenAI(base_url=openrouter_base_url, api_key=api_key("OPENROUTER_API_KEY"), max_retries=0)
+    return client
+
+
+def provider_for(model_config):
+    return "xai" if "x-ai/" in model_config["model"] else "openrouter"
+
+
+def load_image(model_config, q, timing=None):
+    """Return (data URL, variant info) for the question's image, preprocessed per the model's settings"""
+    return image_cache.get(f"images/{q['image']}", model_config.get("image"), timing)
+
+
+def build_params(model_config, q, image_url):
+    params = {
+        "model": model_config["model"],
+        "messages": [
+            {"role": "system", "content": SYS_PROMPT},
+            {"role": "user", "content": [
+                {"type": "text", "text": q["question"]},
+                {"type": "image_url", "image_url": {"url": image_url}, "detail": "high"}
+            ]}
+        ],
+        "temperature": 0.0,
+        "extra_body": {
+            "usage": {"include": True}
+        }
+    }
+    if model_config.get("reasoning_effort"):
+        params["reasoning_effort"] = model_config["reasoning_effort"]
+    elif model_config.get("reasoning_max_tokens"):
+        params['extra_body'].update({'reasoning': {'max_tokens': 80000}})
+        params['max_tokens'] = 80000 #gemini
+    return params
+
+
+def build_xai_chat(xai, model_config, q, image_url):
+    from xai_sdk.chat import user, system, image
+    chat = xai.chat.create(
+        model=model_config["model"].replace("x-ai/", ""),
+        temperature=0.0
+    )
+    chat.append(system(SYS_PROMPT))
+    chat.append(user(
+        q["question"],
+        # image(image_url=image_url),
+        image(image_url=image_url, detail="high"),
+    ))
+    return chat
+
+
+def parse_openrouter_response(response):
+    content = response.choices[0].message.content
+    # Clean up model formatting tags
+    content = clean_response(content)
+    reasoning_trace = getattr(response.choices[0].message, 'reasoning', None)
+    usage = response.usage if hasattr(response, 'usage') else None
+    return content, reasoning_trace, usage
+
+
+def is_streamed(model_config):
+    return model_config.get("stream", stream_requests)
+
+
+def stream_limits(model_config):
+    """(wall-clock, token) ceilings for a streamed request"""
+    return model_config.get("max_seconds", max_seconds), model_config.get("max_stream_tokens", max_stream_tokens)
+
+
+def stream_params(model_config, q, image_url):
+    params = build_params(model_config, q, image_url)
+    params["stream"] = True
+    params["stream_options"] = {"include_usage": True}
+    seconds = stream_limits(model_config)[0]
+    if seconds:
+        params["timeout"] = seconds  # not part of the body: the client's read timeout, so a stall can't outlast the ceiling
+    return params
+
+
+def xai_client_for(seconds=None):
+    """The xAI client, created on first use; for a wall-clock ceiling, one whose gRPC deadline (which covers the
+    whole stream) is that ceiling"""
+    timeout = seconds or XAI_TIMEOUT
+    with clients_lock:
+        if timeout not in xai_clients:
+            from xai_sdk import Client as XAIClient
+            xai_clients[timeout] = XAIClient(api_key=api_key("XAI_API_KEY"), timeout=timeout, **xai_connection)
+        return xai_clients[timeout]
+
+
+def parse_xai_response(xai_response):
+    content = xai_response.content
+    reasoning_trace = getattr(xai_response, 'reasoning', None)
+    usage = getattr(xai_response, 'usage', None)
+    if usage is not None:
+        # Same shape as OpenRouter's usage, including the cost the budget needs
+        usage = SimpleNamespace(
+            prompt_tokens=usage.prompt_tokens,
+            completion_tokens=usage.completion_tokens,
+            total_tokens=usage.total_tokens,
+            cost=getattr(xai_response, 'cost_usd', None),
+            completion_tokens_details=SimpleNamespace(reasoning_tokens=usage.reasoning_tokens),
+        )
+    return content, reasoning_trace, usage
+
+
+def parse_stream(reader, timing, stream):
+    """(content, reasoning, usage) from a finished or cut-off stream; its stats go into stream and timing"""
+    if reader.response is not None and not reader.cutoff:
+        content, reasoning_trace, usage = parse_xai_response(reader.response)
+        parsed = content, reasoning_trace or "".join(reader.reasoning) or None, usage
+    else:
+        usage = reader.usage
+        if usage is None and reader.cutoff:
+            # Usage only comes with the last chunk, so estimate what was generated before the cutoff
+            usage = SimpleNamespace(prompt_tokens=None, completion_tokens=reader.tokens, total_tokens=None, cost=None,
+                                    completion_tokens_details=SimpleNamespace(reasoning_tokens=reader.reasoning_tokens))
+        parsed = clean_response("".join(reader.content)), "".join(reader.reasoning) or None, usage
+    stream.clear()
+    stream.update(reader.stats(None if reader.cutoff else getattr(parsed[2], "completion_tokens", None)))
+    timing["ttft"] = stream["ttft"]
+    return parsed
+
+
+def build_result(model_config, q, content, reasoning_trace, usage, duration):
+    result = {
+        "question": q["question"],
+        "question_id": question_id(q),
+        "image": q["image"],
+        "response": content,
+        "reasoning": reasoning_trace,
+        "correct_answer": q.get("answer", ""),
+        "model": model_config["model"],
+        "time": duration
+    }
+
+    if usage:
+        result["tokens"] = {
+            "prompt": usage.prompt_tokens,
+            "completion": usage.completion_tokens,
+            "total": usage.total_tokens,
+            "cost": usage.cost if hasattr(usage, 'cost') else None
+        }
+        if hasattr(usage, 'completion_tokens_details') and usage.completion_tokens_details:
+            result["tokens"]["reasoning"] = getattr(usage.completion_tokens_details, 'reasoning_tokens', 0)
+    return result
+
+
+def response_cache_key(model_config, q, variant, sample=None):
+    # The exact request body, with the image data swapped for its content hash and preprocessing settings
+    params = build_params(model_config, q, f"sha256:{variant['sha256']}")
+    request = {"provider": provider_for(model_config), "params": params, "image_settings": variant["settings"]}
+    if sample is not None:
+        # Each of a model's k samples is its own request, or they would all replay one cached answer
+        request["sample"] = sample
+    return request_fingerprint(request)
+
+
+def cached_response(model_config, q, variant, sample=None):
+    """Return (cache key, result rebuilt from the response cache or None)"""
+    if response_cache is None:
+        return None, None
+    key = response_cache_key(model_config, q, variant, sample)
+    entry = response_cache.get(key)
+    if entry is None:
+        return key, None
+    # "time" stays the original call's duration; cache_hit marks it so timing stats can leave it out
+    result = build_result(model_config, q, entry["response"], entry["reasoning"], None, entry["time"])
+    if entry.get("tokens"):
+        result["tokens"] = entry["tokens"]
+    result["image_variant"] = variant
+    result["cache_hit"] = True
+    result["cached_at"] = datetime.fromtimestamp(entry["cached_at"]).isoformat(timespec="seconds")
+    return key, result
+
+
+def finish_result(model_config, q, parsed, variant, timing, cache_key, stream=None):
+    content, reasoning_trace, usage = parsed
+    result = build_result(model_config, q, content, reasoning_trace, usage, timing["total"])
+    result["image_variant"] = variant
+    result["timing"] = timing
+    if stream:
+        result["stream"] = dict(stream)
+        if stream.get("cutoff"):
+            cache_key = None  # a cut-off answer depends on the ceilings, which the cache key leaves out
+    if cache_key is not None:
+        response_cache.put(cache_key, {k: result.get(k) for k in ("response", "reasoning", "tokens", "time")})
+    return result
+
+
+def sample_count(model_config):
+    return max(1, int(model_config.get("samples", 1)))
+
+
+def merge_samples(results):
+    """One result from k samples of a question: the majority answer, with every sample kept compactly.
+
+    Identical answers (after the same normalization create_tsv scores with) are
+    stored once in samples["answers"], and samples["picks"] says which one each
+    sample gave. Only the first reasoning trace behind each distinct answer is kept.
+    Tokens and cost are summed over the samples; time is the slowest sample.
+    """
+    answers, reasoning, picks, seen = [], [], [], {}
+    for r in results:
+        key = normalize(r["response"])
+        if key not in seen:
+            seen[key] = len(answers)
+            answers.append(r["response"])
+            reasoning.append(r.get("reasoning"))
+        picks.append(seen[key])
+    counts = [picks.count(i) for i in range(len(answers))]
+    top = counts.index(max(counts))  # ties go to the answer seen first
+
+    merged = dict(results[picks.index(top)])
+    merged["response"] = answers[top]
+    merged["reasoning"] = reasoning[top]
+    merged["time"] = max((r["time"] for r in results if r["time"] is not None), default=None)
+    if not all(r.get("cache_hit") for r in results):
+        merged.pop("cache_hit", None)
+        merged.pop("cached_at", None)
+    token_sets = [r["tokens"] for r in results if r.get("tokens")]
+    if token_sets:
+        merged["tokens"] = {}
+        for key in ("prompt", "completion", "total", "cost", "reasoning"):
+            values = [t[key] for t in token_sets if t.get(key) is not None]
+            merged["tokens"][key] = sum(values) if values else None
+    timings = [r["timing"] for r in results if r.get("timing")]
+    if timings:
+        merged["timing"] = {phase: max((t[phase] for t in timings if t.get(phase) is not None), default=None)
+                            for phase in timings[0]}
+    merged["samples"] = {
+        "k": len(results),
+        "answers": answers,
+        "picks": picks,
+        "agreement": counts[top] / len(results),
+        "times": [None if r["time"] is None else round(r["time"], 2) for r in results],
+    }
+    if any(reasoning):
+        merged["samples"]["reasoning"] = reasoning
+    return merged
+
+
+def save_result(model_config, result):
+    with results_lock:
+        all_results.setdefault(model_config["name"], []).append(result)
+        result_index.add(model_config["name"], result)
+    journal.append(model_config["name"], result)
+
+
+def is_done(model_config, q):
+    return result_index.has(model_config["name"], q)
+
+
+def log_start(model_config, i, total, q):
+    timestamp = datetime.now().strftime("%H:%M:%S")
+    print(f"[{timestamp}] [{model_config['name']}] [{i+1}/{total}] {q['question'][:60]}...")
+
+
+def log_done(model_config, result):
+    source = "cached" if result.get("cache_hit") else f"{result['time']:.1f}s"
+    stream = result.get("stream") or {}
+    if stream.get("ttft") is not None:
+        source += f", first token {stream['ttft']:.1f}s"
+    if stream.get("cutoff"):
+        source += f", CUT OFF at {stream['cutoff']} ceiling after {stream['streamed_tokens']} tokens"
+    if result.get("samples"):
+        source += f", {result['samples']['k']} samples, {result['samples']['agreement']:.0%} agree"
+    print(f"[{model_config['name']}] → {result['response'][:60]}... ({source})")
+
+
+def log_error(model_config, e, duration):
+    print(f"[{model_config['name']}] ERROR: {e} (after {duration:.1f}s)")
+    print(f"[{model_config['name']}] ERROR TYPE: {type(e)}")
+    print(f"[{model_config['name']}] ERROR ATTRIBUTES: {dir(e)}")
+
+    # Try to get more details about JSON errors
+    if "Expecting value" in str(e):
+        print(f"[{model_config['name']}] This looks like a JSON parsing error")
+        if hasattr(e, 'doc'):
+            print(f"[{model_config['name']}] MALFORMED JSON (first 1000 chars):")
+            print(repr(e.doc[:1000]))
+        if hasattr(e, 'response'):
+            print(f"[{model_config['name']}] Response object found")
+        if hasattr(e, 'args'):
+            print(f"[{model_config['name']}] Args: {e.args}")
+
+
+def retry_or_raise(model_config, e, attempt):
+    """Returns how long to wait before retrying, or re-raises if e isn't worth retrying"""
+    decision = classify_error(e)
+    if decision.rate_limited:
+        limiters[provider_for(model_config)].on_rate_limited(decision.retry_after)
+    if not decision.retryable or attempt >= max_retries:
+        raise e
+    delay = backoff_delay(attempt, decision.retry_after)
+    metrics.retry(model_config["name"])
+    print(f"[{model_config['name']}] RETRY {attempt + 1}/{max_retries} in {delay:.1f}s after {type(e).__name__}: {str(e)[:120]}")
+    return delay
+
+
+def tokens_used(parsed):
+    return getattr(parsed[2], "total_tokens", None)
+
+
+def call_with_retries(model_config, request, timing):
+    """Waits on the provider limiter (counted as queue time) and calls request() until it succeeds"""
+    limiter = limiters[provider_for(model_config)]
+    attempt = 0
+    while True:
+        waited = time.time()
+        estimate = limiter.acquire()
+        sent = time.time()
+        timing["queue"] += sent - waited
+        try:
+            parsed = request(sent)
+        except Exception as e:
+            timing["network"] += time.time() - sent
+            time.sleep(retry_or_raise(model_config, e, attempt))
+            attempt += 1
+            continue
+        timing["network"] += time.time() - sent
+        limiter.on_success(tokens_used(parsed), estimate)
+        return parsed
+
+
+async def call_with_retries_async(model_config, request, timing):
+    limiter = limiters[provider_for(model_config)]
+    attempt = 0
+    while True:
+        waited = time.time()
+        estimate = await limiter.acquire_async()
+        sent = time.time()
+        timing["queue"] += sent - waited
+        try:
+            parsed = await request(sent)
+        except Exception as e:
+            timing["network"] += time.time() - sent
+            await asyncio.sleep(retry_or_raise(model_config, e, attempt))
+            attempt += 1
+            continue
+        timing["network"] += time.time() - sent
+        limiter.on_success(tokens_used(parsed), estimate)
+        return parsed
+
+
+def new_timing(queued):
+    """Per-request phases in seconds: image read/encode, waiting for a slot, time to first byte and (streamed) first
+    token, network, total"""
+    return {"read": 0.0, "encode": 0.0, "queue": queued, "ttfb": None, "ttft": None, "network": 0.0, "total": None}
+
+
+def call_model(model_config, q, queued=0.0, sample=None):
+    start = time.time()
+    timing = new_timing(queued)
+    image_url, variant = load_image(model_config, q, timing)
+    cache_key, cached = cached_response(model_config, q, variant, sample)
+    if cached is not None:
+        timing["total"] = time.time() - start
+        cached["timing"] = timing
+        return cached
+    stream = {}
+
+    def request(sent):
+        if is_streamed(model_config):
+            seconds, tokens = stream_limits(model_config)
+            reader = streaming.StreamReader(sent, seconds, tokens)
+            if provider_for(model_config) == "xai":
+                chat = build_xai_chat(xai_client_for(seconds), model_config, q, image_url)
+                streaming.read_xai(chat.stream(), reader)
+            else:
+                def open_stream():
+                    response = openrouter_client().chat.completions.create(**stream_params(model_config, q, image_url))
+                    timing["ttfb"] = time.time() - sent
+                    return response
+                streaming.read_openai(open_stream, reader)
+            return parse_stream(reader, timing, stream)
+        if provider_for(model_config) == "xai":
+            chat = build_xai_chat(xai_client_for(), model_config, q, image_url)
+            return parse_xai_response(chat.sample())
+        # Streaming-response mode returns once headers arrive, which gives time to first byte
+        with openrouter_client().chat.completions.with_streaming_response.create(**build_params(model_config, q, image_url)) as raw:
+            timing["ttfb"] = time.time() - sent
+            return parse_openrouter_response(raw.parse())
+
+    parsed = call_with_retries(model_config, request, timing)
+    timing["total"] = time.time() - start
+    return finish_result(model_config, q, parsed, variant, timing, cache_key, stream)
+
+
+async def call_model_async(model_config, q, clients, limits, queued=0.0, sample=None):
+    """call_model for the event loop; each request (every sample, too) holds a slot of both `limits`"""
+    start = time.time()
+    timing = new_timing(queued)
+    image_url, variant = await asyncio.to_thread(load_image, model_config, q, timing)
+    cache_key, cached = cached_response(model_config, q, variant, sample)
+    if cached is not None:
+        timing["total"] = time.time() - start
+        cached["timing"] = timing
+        return cached
+    stream = {}
+
+    async def request(sent):
+        if is_streamed(model_config):
+            reader = streaming.StreamReader(sent, *stream_limits(model_config))
+            if provider_for(model_config) == "xai":
+                chat = build_xai_chat(clients["xai"], model_config, q, image_url)
+                await streaming.read_xai_async(chat.stream(), reader)
+            else:
+                async def open_stream():
+                    response = await clients["openrouter"].chat.completions.create(
+                        **stream_params(model_config, q, image_url))
+                    timing["ttfb"] = time.time() - sent
+                    return response
+                await streaming.read_openai_async(open_stream, reader)
+            return parse_stream(reader, timing, stream)
+        if provider_for(model_config) == "xai":
+            chat = build_xai_chat(clients["xai"], model_config, q, image_url)
+            return parse_xai_response(await chat.sample())
+        async with clients["openrouter"].chat.completions.with_streaming_response.create(
+                **build_params(model_config, q, image_url)) as raw:
+            timing["ttfb"] = time.time() - sent
+            return parse_openrouter_response(await raw.parse())
+
+    model_limit, provider_limit = limits
+    waited = time.time()
+    async with model_limit, provider_limit:
+        timing["queue"] += time.time() - waited
+        parsed = await call_with_retries_async(model_config, request, timing)
+    timing["total"] = time.time() - start
+    return finish_result(model_config, q, parsed, variant, timing, cache_key, stream)
+
+
+def call_samples(model_config, q, queued=0.0):
+    """call_model, or with "samples": k, k parallel calls merged into one result (any failure fails the question)"""
+    k = sample_count(model_config)
+    if k == 1:
+        return call_model(model_config, q, queued)
+    with ThreadPoolExecutor(max_workers=k) as executor:
+        results = list(executor.map(lambda i: call_model(model_config, q, queued, sample=i), range(k)))
+    return merge_samples(results)
+
+
+async def call_samples_async(model_config, q, clients, limits, queued=0.0):
+    k = sample_count(model_config)
+    if k == 1:
+        return await call_model_async(model_config, q, clients, limits, queued)
+    results = await asyncio.gather(*(call_model_async(model_config, q, clients, limits, queued, sample=i)
+                                     for i in range(k)))
+    return merge_samples(results)
+
+
+def log_finished(model_config, completed, skipped):
+    if budget.is_paused(model_config["name"]):
+        print(f"[{model_config['name']}] PAUSED at budget cap: {completed} completed, {skipped} skipped")
+    else:
+        print(f"[{model_config['name']}] DONE! {completed} completed, {skipped} skipped")
 
 
 def run_model(model_config, questions):
-    model_results = all_results.get(model_config["name"], [])
     completed = skipped = 0
     
     for i, q in enumerate(questions):
-        if any(r.get("question") == q["question"] and r.get("image") == q["image"] for r in model_results):
-            timestamp = datetime.now().strftime("%H:%M:%S")
-            # print(f"[{timestamp}] [{model_config['name']}] [{i+1}/{len(questions)}] SKIP")
+        if is_done(model_config, q):
             skipped += 1
             continue
+        reserved = budget.reserve(model_config["name"])
+        if reserved is None:
+            break
             
-        timestamp = datetime.now().strftime("%H:%M:%S")
-        print(f"[{timestamp}] [{model_config['name']}] [{i+1}/{len(questions)}] {q['question'][:60]}...")
+        log_start(model_config, i, len(questions), q)
         start = time.time()
+        metrics.start(model_config["name"])
 
         try:
-            with open(f"images/{q['image']}", "rb") as f:
-                data = base64.b64encode(f.read()).decode('utf-8')
-            mime_type, _ = mimetypes.guess_type(q['image'])
-            if not mime_type or not mime_type.startswith('image/'):
-                mime_type = 'image/jpeg'
-            params = {
-                "model": model_config["model"],
-                "messages": [
-                    {"role": "system", "content": SYS_PROMPT},
-                    {"role": "user", "content": [
-                        {"type": "text", "text": q["question"]},
-                        {"type": "image_url", "image_url": {"url": f"data:{mime_type};base64,{data}"}, "detail": "high"}
-                    ]}
-                ],
-                "temperature": 0.0,
-                "extra_body": {
-                    "usage": {"include": True}
-                }
-            }
-            if model_config.get("reasoning_effort"):
-                params["reasoning_effort"] = model_config["reasoning_effort"]
-            elif model_config.get("reasoning_max_tokens"):
-                params['extra_body'].update({'reasoning': {'max_tokens': 80000}})
-                params['max_tokens'] = 80000 #gemini
-                
-            if "x-ai/" in model_config["model"]:
-                chat = xai_client.chat.create(
-                    model=model_config["model"].replace("x-ai/", ""),
-                    temperature=0.0
-                )
-                chat.append(system(SYS_PROMPT))
-                chat.append(user(
-                    q["question"],
-                    # image(image_url=f"data:{mime_type};base64,{data}"),
-                    image(image_url=f"data:{mime_type};base64,{data}", detail="high"),
-                ))
-                xai_response = chat.sample()
-                content = xai_response.content
-                reasoning_trace = getattr(xai_response, 'reasoning', None) 
-                usage = getattr(xai_response, 'usage', None)
-                
-            else:
-                response = client.chat.completions.create(**params)
-                content = response.choices[0].message.content
-                # Clean up model formatting tags
-                content = content.replace('\n', '').replace('<|begin_of_box|>', '').replace('<|end_of_box|>', '').replace('<answer>', '').replace('</answer>', '')
-                reasoning_trace = getattr(response.choices[0].message, 'reasoning', None)
-                usage = response.usage if hasattr(response, 'usage') else None
-                
-            duration = time.time() - start
-            
-            result = {
-                "question": q["question"],
-                "image": q["image"],
-                "response": content,
-                "reasoning": reasoning_trace,
-                "correct_answer": q.get("answer", ""),
-                "model": model_config["model"],
-                "time": duration
-            }
-            
-            if usage:
-                result["tokens"] = {
-                    "prompt": usage.prompt_tokens,
-                    "completion": usage.completion_tokens,
-                    "total": usage.total_tokens,
-                    "cost": usage.cost if hasattr(usage, 'cost') else None
-                }
-                if hasattr(usage, 'completion_tokens_details') and usage.completion_tokens_details:
-                    result["tokens"]["reasoning"] = getattr(usage.completion_tokens_details, 'reasoning_tokens', 0)
-            
-            with results_lock:
-                model_results.append(result)
-                all_results[model_config["name"]] = model_results
-                with open("results.json", "w") as f:
-                    json.dump(all_results, f, indent=2)
-            
-            print(f"[{model_config['name']}] → {content[:60]}... ({duration:.1f}s)")
-            completed += 1
-            
+            result = call_samples(model_config, q)
         except Exception as e:
-            duration = time.time() - start
-            print(f"[{model_config['name']}] ERROR: {e} (after {duration:.1f}s)")
-            print(f"[{model_config['name']}] ERROR TYPE: {type(e)}")
-            print(f"[{model_config['name']}] ERROR ATTRIBUTES: {dir(e)}")
-            
-            # Try to get more details about JSON errors
-            if "Expecting value" in str(e):
-                print(f"[{model_config['name']}] This looks like a JSON parsing error")
-                if hasattr(e, 'doc'):
-                    print(f"[{model_config['name']}] MALFORMED JSON (first 1000 chars):")
-                    print(repr(e.doc[:1000]))
-                if hasattr(e, 'response'):
-                    print(f"[{model_config['name']}] Response object found")
-                if hasattr(e, 'args'):
-                    print(f"[{model_config['name']}] Args: {e.args}")
+            budget.settle(model_config["name"], reserved)
+            log_error(model_config, e, time.time() - start)
+            metrics.error(model_config["name"])
+            dead_letters.add(model_config["name"], q, e)
             continue
-    
-    print(f"[{model_config['name']}] DONE! {completed} completed, {skipped} skipped")
 
-def main():
-    if os.path.exists("results.json"):
-        with open("results.json") as f:
-            all_results.update(json.load(f))
+        budget.settle(model_config["name"], reserved, result)
+        metrics.finish(model_config["name"], result)
+        save_result(model_config, result)
+        log_done(model_config, result)
+        completed += 1
     
-    with ThreadPoolExecutor(max_workers=len(MODELS)) as executor:
-        futures = [executor.submit(run_model, model_config, questions) for model_config in MODELS]
-        for future in futures:
-            future.result()
+    log_finished(model_config, completed, skipped)
+
+
+async def run_model_async(model_config, questions, clients, provider_limits, concurrency):
+    """Like run_model, but keeps up to `concurrency` requests in flight for this model.
+
+    The request limits are taken per sample inside call_model_async, so "samples": k
+    doesn't multiply the requests in flight; open_questions only bounds how many
+    questions hold a budget reservation at once.
+    """
+    open_questions = asyncio.Semaphore(concurrency)
+    limits = (asyncio.Semaphore(concurrency), provider_limits[provider_for(model_config)])
+    pending = [(i, q) for i, q in enumerate(questions) if not is_done(model_config, q)]
+    skipped = len(questions) - len(pending)
+    completed = 0
+
+    async def worker(i, q):
+        nonlocal completed
+        queued = time.time()
+        async with open_questions:
+            reserved = await budget.reserve_async(model_config["name"])
+            if reserved is None:
+                return
+            log_start(model_config, i, len(questions), q)
+            start = time.time()
+            metrics.start(model_config["name"])
+            try:
+                result = await call_samples_async(model_config, q, clients, limits, queued=start - queued)
+            except Exception as e:
+                budget.settle(model_config["name"], reserved)
+                log_error(model_config, e, time.time() - start)
+                metrics.error(model_config["name"])
+                dead_letters.add(model_config["name"], q, e)
+                return
+            budget.settle(model_config["name"], reserved, result)
+        metrics.finish(model_config["name"], result)
+        save_result(model_config, result)
+        log_done(model_config, result)
+        completed += 1
+
+    await asyncio.gather(*(worker(i, q) for i, q in pending))
+    log_finished(model_config, completed, skipped)
+
+
+def print_status(questions):
+    """Report done/remaining work per model from the result index, without calling any API"""
+    total_remaining = 0
+    for model_config in MODELS:
+        remaining = len(result_index.remaining(model_config["name"], questions))
+        total_remaining += remaining
+        done = len(questions) - remaining
+        print(f"[{model_config['name']}] {done}/{len(questions)} done, {remaining} remaining ({provider_for(model_config)}), "
+              f"{budget.describe(model_config['name'], remaining)}")
+    print(f"\n{total_remaining} requests remaining across {len(MODELS)} models")
+    if budget.global_cap is not None:
+        print(f"Spent ${sum(budget.spent.values()):.2f} of ${budget.global_cap:.2f} budget")
+
+
+async def run_all_async(work, concurrency, provider_concurrency):
+    clients = {}
+    if any(provider_for(m) == "openrouter" for m, _ in work):
+        from openai import AsyncOpenAI
+        clients["openrouter"] = AsyncOpenAI(base_url=openrouter_base_url, api_key=api_key("OPENROUTER_API_KEY"),
+                                            max_retries=0)
+    if any(provider_for(m) == "xai" for m, _ in work):
+        from xai_sdk import AsyncClient as AsyncXAIClient
+        clients["xai"] = AsyncXAIClient(api_key=api_key("XAI_API_KEY"), timeout=XAI_TIMEOUT, **xai_connection)
+    provider_limits = {p: asyncio.Semaphore(n) for p, n in provider_concurrency.items()}
+    await asyncio.gather(*(run_model_async(m, qs, clients, provider_limits, concurrency) for m, qs in work))
+
+
+def redrive_work():
+    """(model config, questions) for the dead-lettered requests of models in MODELS"""
+    entries = dead_letters.take({m["name"] for m in MODELS})
+    failed = {(e["model_name"], e["question_id"]) for e in entries}
+    work = []
+    for model_config in MODELS:
+        qs = [q for q in load_questions() if (model_config["name"], question_id(q)) in failed]
+        if qs:
+            work.append((model_config, qs))
+    print(f"Re-driving {sum(len(qs) for _, qs in work)} dead-lettered requests")
+    return work
+
+
+def cached_batch_result(model_config, q):
+    """q's result rebuilt from the response cache if every one of its samples is there, else None.
+
+    The key is the one the sync and async paths use, so answers cached by either are reused here.
+    """
+    if response_cache is None:
+        return None
+    if model_config.get("image"):
+        variant = load_image(model_config, q)[1]
+    else:
+        # Hashed from disk: the unprocessed image is never base64-encoded into memory in batch mode
+        sha256, size = image_cache.file_hash(f"images/{q['image']}")
+        variant = {"sha256": sha256, "settings": None, "bytes": size}
+    k = sample_count(model_config)
+    results = []
+    for sample in (range(k) if k > 1 else [None]):
+        _, cached = cached_response(model_config, q, variant, sample)
+        if cached is None:
+            return None
+        results.append(cached)
+    return merge_samples(results) if k > 1 else results[0]
+
+
+def write_batch(model_config, questions, f, max_bytes=None, max_requests=None):
+    """Write batch lines for questions to f, stopping before the question that would go over max_bytes or
+    max_requests (all of a question's samples go in the same batch). Returns ({custom_id: image variant} for
+    what was written, number of questions written)."""
+    k = sample_count(model_config)
+    requests = {}
+    for n, q in enumerate(questions):
+        start, lines = f.tell(), {}
+        for sample in (range(k) if k > 1 else [None]):
+            custom_id = question_id(q) if sample is None else f"{question_id(q)}#{sample}"
+            if model_config.get("image"):
+                # Preprocessed variants are small and come from the image cache
+                image_url, variant = load_image(model_config, q)
+                batch.write_request(f, custom_id, build_params(model_config, q, image_url))
+            else:
+                path = f"images/{q['image']}"
+                sha256, size = batch.write_request(f, custom_id, build_params(model_config, q, batch.IMAGE_PLACEHOLDER),
+                                                   path, guess_mime_type(path))
+                variant = {"sha256": sha256, "settings": None, "bytes": size}
+            lines[custom_id] = variant
+        # The first question always goes in, so a file never ends up empty
+        if n and ((max_bytes and f.tell() > max_bytes) or (max_requests and len(requests) + len(lines) > max_requests)):
+            f.seek(start)
+            f.truncate()
+            return requests, n
+        requests.update(lines)
+    return requests, len(questions)
+
+
+def ingest_batch(model_config, batch_id, requests, finished, reserved=None):
+    """Save a finished batch's answers like any other result; failed requests go to dead_letters.jsonl"""
+    from openai.types.chat import ChatCompletion
+    reserved = reserved if reserved is not None else {}
+    outputs = {}
+    for line in batch.read_output(openrouter_client(), finished.output_file_id):
+        outputs[line["custom_id"]] = line
+    for line in batch.read_output(openrouter_client(), finished.error_file_id):
+        outputs.setdefault(line["custom_id"], line)
+
+    by_question = {}
+    for custom_id in requests:
+        by_question.setdefault(custom_id.split("#")[0], []).append(custom_id)
+    completed = failed = 0
+    for qid, custom_ids in by_question.items():
+        q = open_question_store().get(qid)
+        results = []
+        try:
+            for custom_id in custom_ids:
+                line = outputs.get(custom_id) or {}
+                response = line.get("response") or {}
+                if response.get("status_code") != 200:
+                    error = line.get("error") or response.get("body") or f"batch {finished.status}, no output"
+                    raise RuntimeError(f"batch {batch_id} request {custom_id}: {error}")
+                parsed = parse_openrouter_response(ChatCompletion.model_validate(response["body"]))
+                sample = int(custom_id.split("#")[1]) if "#" in custom_id else None
+                result = build_result(model_config, q, *parsed, None)
+                result["image_variant"] = requests[custom_id]
+                result["batch_id"] = batch_id
+                if response_cache is not None:
+                    key = response_cache_key(model_config, q, requests[custom_id], sample)
+                    response_cache.put(key, {k: result.get(k) for k in ("response", "reasoning", "tokens", "time")})
+                results.append(result)
+        except Exception as e:
+            budget.settle(model_config["name"], reserved.pop(qid, None))
+            dead_letters.add(model_config["name"], q, e)
+            failed += 1
+            continue
+        result = merge_samples(results) if len(results) > 1 else results[0]
+        budget.settle(model_config["name"], reserved.pop(qid, None), result)
+        save_result(model_config, result)
+        completed += 1
+    print(f"[{model_config['name']}] batch {batch_id}: {completed} saved, {failed} failed")
+    return completed
+
+
+def run_model_batch(model_config, questions, state, poll_interval):
+    """Submit this model's remaining questions as provider batches, wait for them and ingest the results.
+
+    Usually that's one batch, or a few when the requests don't fit in one
+    input file. If the budget only has room for part of the rest while other
+    models' requests are in flight, the remainder goes out as another batch
+    once this one has settled.
+    """
+    name = model_config["name"]
+    log = lambda message: print(f"[{name}] {message}")
+    # Batches from an earlier, interrupted run come first; what failed in them waits for --redrive
+    completed, handled = 0, set()
+    for batch_id, entry in state.pending(name).items():
+        log(f"resuming batch {batch_id}")
+        completed += ingest_batch(model_config, batch_id, entry["requests"],
+                                  batch.wait(openrouter_client(), batch_id, poll_interval, log))
+        handled.update(custom_id.split("#")[0] for custom_id in entry["requests"])
+        state.remove(batch_id)
+
+    more = True
+    while more:
+        pending, reserved, more, hits = [], {}, False, 0
+        for q in questions:
+            if is_done(model_config, q) or question_id(q) in reserved or question_id(q) in handled:
+                continue
+            # Answers already in the response cache are saved straight away rather than paid for again
+            cached = cached_batch_result(model_config, q)
+            if cached is not None:
+                save_result(model_config, cached)
+                handled.add(question_id(q))
+                completed += 1
+                hits += 1
+                continue
+            amount = budget.try_reserve(name)
+            if amount is WAIT:
+                more = True
+            if amount is None or amount is WAIT:
+                break
+            reserved[question_id(q)] = amount
+            pending.append(q)
+        if hits:
+            log(f"{hits} answers from the response cache")
+        if not pending:
+            if more:
+                with budget.settled:
+                    budget.settled.wait(poll_interval)  # nothing of ours in flight: wait on the other models
+            continue
+
+        # Split into as many batches as the provider's input limits need; all are submitted before waiting
+        submitted, rest = [], pending
+        while rest:
+            fd, path = tempfile.mkstemp(prefix="batch_", suffix=".jsonl", dir=".")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    requests, n = write_batch(model_config, rest, f, batch.MAX_BATCH_BYTES, batch.MAX_BATCH_REQUESTS)
+                part = f" (part {len(submitted) + 1})" if submitted or n < len(rest) else ""
+                log(f"submitting {len(requests)} requests{part} ({os.path.getsize(path) / 1e6:.1f} MB)")
+                batch_id = batch.submit(openrouter_client(), path, metadata={"model_name": name}).id
+            finally:
+                os.remove(path)
+            state.add(batch_id, name, requests)
+            submitted.append((batch_id, requests))
+            rest = rest[n:]
+        for batch_id, requests in submitted:
+            finished = batch.wait(openrouter_client(), batch_id, poll_interval, log)
+            completed += ingest_batch(model_config, batch_id, requests, finished, reserved)
+            state.remove(batch_id)
+        handled.update(question_id(q) for q in pending)
+    log_finished(model_config, completed, len(questions) - len(handled))
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Run the VR benchmark against MODELS')
+    parser.add_argument('--mode', choices=['threads', 'async'], default='threads',
+                        help='threads: one worker per model, one request at a time (default). '
+                             'async: many requests in flight per model')
+    parser.add_argument('--concurrency', type=int, default=PER_MODEL_CONCURRENCY,
+                        help=f'Async mode: requests in flight per model (default {PER_MODEL_CONCURRENCY})')
+    parser.add_argument('--openrouter-concurrency', type=int, default=PROVIDER_CONCURRENCY["openrouter"],
+                        help='Async mode: max requests in flight to OpenRouter across all models')
+    parser.add_argument('--xai-concurrency', type=int, default=PROVIDER_CONCURRENCY["xai"],
+                        help='Async mode: max requests in flight to xAI across all models')
+    parser.add_argument('--fsync-every', type=int, default=20,
+                        help='Sync the results.jsonl journal to disk every N answers (default 20)')
+    parser.add_argument('--image-cache-mb', type=int, default=IMAGE_CACHE_MB,
+                        help=f'In-memory budget for encoded images (default {IMAGE_CACHE_MB})')
+    parser.add_argument('--image-cache-dir', default=IMAGE_CACHE_DIR,
+                        help='Also keep encoded images in an on-disk store here so later runs start warm')
+    parser.add_argument('--prep-workers', type=int, default=PREP_WORKERS,
+                        help='Processes used to resize images for models with "image" settings (default: one per CPU)')
+    parser.add_argument('--no-response-cache', action='store_true',
+                        help='Always call the API: neither read nor write the response cache')
+    parser.add_argument('--response-cache-mb', type=int, default=RESPONSE_CACHE_MB,
+                        help=f'Size cap for the response cache before LRU eviction (default {RESPONSE_CACHE_MB})')
+    parser.add_argument('--response-cache-ttl-days', type=float, default=RESPONSE_CACHE_TTL_DAYS,
+                        help=f'Cached responses older than this are refetched (default {RESPONSE_CACHE_TTL_DAYS}, 0 = never expire)')
+    parser.add_argument('--openrouter-rpm', type=float, default=PROVIDER_LIMITS["openrouter"]["rpm"],
+                        help='Requests/min allowed to OpenRouter before 429 backoff (0 = unlimited)')
+    parser.add_argument('--openrouter-tpm', type=float, default=PROVIDER_LIMITS["openrouter"]["tpm"],
+                        help='Tokens/min allowed to OpenRouter (default unlimited)')
+    parser.add_argument('--xai-rpm', type=float, default=PROVIDER_LIMITS["xai"]["rpm"],
+                        help='Requests/min allowed to xAI before 429 backoff (0 = unlimited)')
+    parser.add_argument('--xai-tpm', type=float, default=PROVIDER_LIMITS["xai"]["tpm"],
+                        help='Tokens/min allowed to xAI (default unlimited)')
+    parser.add_argument('--max-retries', type=int, default=MAX_RETRIES,
+                        help=f'Retries for 429/5xx/timeouts before a request goes to dead_letters.jsonl (default {MAX_RETRIES})')
+    parser.add_argument('--redrive', action='store_true',
+                        help='Only retry the requests in dead_letters.jsonl')
+    parser.add_argument('--metrics-interval', type=float, default=METRICS_INTERVAL,
+                        help=f'Append live counters to metrics.jsonl every N seconds (default {METRICS_INTERVAL}, 0 = off)')
+    parser.add_argument('--openrouter-base-url', default=OPENROUTER_BASE_URL,
+                        help='OpenAI-compatible endpoint to send OpenRouter requests to (e.g. mock_server.py)')
+    parser.add_argument('--xai-api-host', default=XAI_API_HOST,
+                        help='host:port of the xAI gRPC API (e.g. mock_server.py --xai-port)')
+    parser.add_argument('--xai-insecure', action='store_true',
+                        help='Talk to --xai-api-host over plain-text gRPC (for local stand-ins)')
+    parser.add_argument('--budget', type=float, default=BUDGET,
+                        help='Global spending cap in USD across all models in results.json; the run pauses when reached')
+    parser.add_argument('--model-budget', type=float, default=MODEL_BUDGET,
+                        help='Spending cap in USD per model, unless its MODELS entry sets "max_cost"')
+    parser.add_argument('--sample-per-stratum', type=int, default=SAMPLE_PER_STRATUM,
+                        help='Run this many questions per tag and per domain first (0 = keep questions.json order)')
+    parser.add_argument('--questions', metavar='QUERY',
+                        help='Only run matching questions, e.g. "tags=Spatial,domain=sports" or "tags=Spatial|Reasoning"')
+    parser.add_argument('--sample', type=int,
+                        help='Only run a random sample of this many questions per tag (after --questions)')
+    parser.add_argument('--batch', action='store_true',
+                        help='Submit each OpenRouter model\'s remaining questions through the provider batch API '
+                             '(cheaper, higher limits, results within 24h); xAI models are skipped')
+    parser.add_argument('--batch-poll-interval', type=float, default=batch.POLL_INTERVAL,
+                        help=f'Seconds between batch status checks (default {batch.POLL_INTERVAL})')
+    parser.add_argument('--stream', action='store_true', default=STREAM,
+                        help='Stream answers: records time to first token and tokens/sec, and enables the ceilings below')
+    parser.add_argument('--max-seconds', type=float, default=MAX_SECONDS,
+                        help='Cut off a streamed request after this many seconds, keeping its partial reasoning')
+    parser.add_argument('--max-stream-tokens', type=int, default=MAX_STREAM_TOKENS,
+                        help='Cut off a streamed request after this many streamed tokens (content + reasoning)')
+    parser.add_argument('--status', action='store_true',
+                        help='Show how many questions are done/remaining per model and exit (no API calls)')
+    parser.add_argument('--compact', action='store_true',
+                        help='Fold results.jsonl into results.json and exit, e.g. after a crash')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    global journal, result_index, image_cache, response_cache, limiters, max_retries, metrics, budget
+    global client, openrouter_base_url, xai_connection, questions
+    global stream_requests, max_seconds, max_stream_tokens
+    args = parse_args(argv)
+    if args.questions or args.sample:
+        try:
+            questions = open_question_store().select(args.questions, args.sample, MAX_QUESTIONS)
+        except ValueError as e:
+            raise SystemExit(str(e))
+        print(f"Selected {len(questions)} questions")
+    if args.compact:
+        results = compact()
+        print(f"Compacted results.jsonl into results.json ({sum(len(r) for r in results.values())} results)")
+        return
+
+    # Resume from results.json plus whatever was journaled since it was last compacted
+    all_results.update(load_results())
+    result_index = ResultIndex(all_results)
+    model_caps = {m["name"]: m.get("max_cost", args.model_budget) for m in MODELS}
+    budget = Budget(args.budget, {name: cap for name, cap in model_caps.items() if cap is not None})
+    budget.load(all_results)
+    if args.status:
+        print_status(load_questions())
+        return
+
+    if args.openrouter_base_url != openrouter_base_url:
+        openrouter_base_url = args.openrouter_base_url
+        client = None
+    if args.xai_api_host != XAI_API_HOST or args.xai_insecure:
+        xai_connection = {"api_host": args.xai_api_host, "use_insecure_channel": args.xai_insecure}
+        xai_clients.clear()
+    image_cache = ImageCache(args.image_cache_mb * 1024 * 1024, args.image_cache_dir, args.prep_workers)
+    if not args.no_response_cache:
+        response_cache = ResponseCache(max_bytes=args.response_cache_mb * 1024 * 1024,
+                                       ttl_seconds=args.response_cache_ttl_days * 86400)
+    limiters = {
+        "openrouter": ProviderLimiter("openrouter", args.openrouter_rpm, args.openrouter_tpm),
+        "xai": ProviderLimiter("xai", args.xai_rpm, args.xai_tpm),
+    }
+    max_retries = args.max_retries
+    stream_requests, max_seconds, max_stream_tokens = args.stream, args.max_seconds, args.max_stream_tokens
+    if args.redrive:
+        work = redrive_work()
+    else:
+        questions = load_questions()
+        ordered = stratified_order(questions, args.sample_per_stratum) if args.sample_per_stratum else questions
+        work = [(m, ordered) for m in MODELS]
+
+    journal = ResultsJournal(batch_size=args.fsync_every)
+    metrics = RunMetrics(interval=args.metrics_interval)
+    metrics.start_writer()
+    try:
+        if args.batch:
+            state = batch.BatchState()
+            for model_config, _ in work:
+                if provider_for(model_config) == "xai":
+                    print(f"[{model_config['name']}] SKIPPED: batch mode only covers OpenAI-compatible providers")
+            work = [(m, qs) for m, qs in work if provider_for(m) != "xai"]
+            if work:
+                with ThreadPoolExecutor(max_workers=len(work)) as executor:
+                    futures = [executor.submit(run_model_batch, m, qs, state, args.batch_poll_interval) for m, qs in work]
+                    for future in futures:
+                        future.result()
+        elif args.mode == "async":
+            provider_concurrency = {"openrouter": args.openrouter_concurrency, "xai": args.xai_concurrency}
+            asyncio.run(run_all_async(work, args.concurrency, provider_concurrency))
+        elif work:
+            with ThreadPoolExecutor(max_workers=len(work)) as executor:
+                futures = [executor.submit(run_model, model_config, qs) for model_config, qs in work]
+                for future in futures:
+                    future.result()
+    finally:
+        metrics.stop_writer()
+        journal.close()
+        compact()
+        image_cache.close()
+        if response_cache is not None:
+            response_cache.close()
     
-    print("\nAll models complete! Results in results.json")
+    metrics.summary()
+    stats = image_cache.stats()
+    print(f"\nImage cache: {stats['hits']} hits, {stats['misses']} encodes, {stats['bytes'] / 1e6:.0f} MB in memory")
+    if response_cache is not None:
+        stats = response_cache.stats()
+        print(f"Response cache: {stats['hits']} hits, {stats['misses']} misses")
+    if budget.paused:
+        capped = "the global budget" if "*" in budget.paused else ", ".join(sorted(budget.paused))
+        print(f"\nPaused: spending cap reached for {capped}. Raise --budget / --model-budget / max_cost and rerun to resume.")
+    if dead_letters.added:
+        print(f"{dead_letters.added} requests failed after retries, see dead_letters.jsonl (re-run them with --redrive)")
+    if budget.paused:
+        print("\nRun paused. Results so far in results.json")
+    else:
+        print("\nAll models complete! Results in results.json")
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
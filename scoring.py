@@ -0,0 +1,355 @@
+#!/usr/bin/env python3
+"""Answer normalization and scoring.
+
+Normalization rules are registered with @rule and run in order on every
+answer. Their regexes are compiled at import and normalize() is memoized, so
+the same "3" or "red" from a dozen models is only normalized once. A Scorer
+precomputes the canonical forms of each question's expected answers, plus
+optional per-question specs from questions.json:
+
+    "answer_regex": "^(5|five) (cats|kittens)$"   full match against the normalized answer (string or list)
+    "tolerance": 0.5                               numeric answers within this of the expected one count
+
+    python3 scoring.py              # rescore results.json with the current rules
+    python3 scoring.py --changes    # and list the answers whose score differs from exact matching
+"""
+import argparse, json, re, time
+from decimal import Decimal
+from functools import lru_cache
+
+from journal import load_results, question_id
+
+RULES = []
+
+
+def rule(fn):
+    """Register a normalization step (str -> str); rules run in registration order"""
+    RULES.append(fn)
+    return fn
+
+
+# Wrappers some models put around the answer despite the prompt
+_FORMAT_TAGS = re.compile(r"<\|begin_of_box\|>|<\|end_of_box\|>|</?answer>|\n")
+
+
+def clean_response(text):
+    """Strip formatting tags from a raw model response (what run.py stores as the response)"""
+    return _FORMAT_TAGS.sub("", text)
+
+
+@rule
+def strip_tags(text):
+    return _FORMAT_TAGS.sub(" ", text)
+
+
+_SPACE = re.compile(r"\s+")
+
+
+@rule
+def lowercase(text):
+    return _SPACE.sub(" ", text).strip().lower()
+
+
+_EDGE_PUNCT = re.compile(r"^[\s\"'`*_([{]+|[\s\"'`*_)\]}.,!?;:]+$")
+
+
+@rule
+def strip_punctuation(text):
+    return _EDGE_PUNCT.sub("", text)
+
+
+_ARTICLE = re.compile(r"^(?:the|an|a) (?=\S)")
+
+
+@rule
+def strip_article(text):
+    return _ARTICLE.sub("", text)
+
+
+_SMALL = {w: i for i, w in enumerate(
+    "zero one two three four five six seven eight nine ten eleven twelve thirteen fourteen fifteen "
+    "sixteen seventeen eighteen nineteen".split())}
+_SMALL.update({w: 10 * i for i, w in enumerate("twenty thirty forty fifty sixty seventy eighty ninety".split(), 2)})
+_SCALES = {"thousand": 1000, "million": 1000000}
+_WORD_VALUES = {**_SMALL, "hundred": 100, **_SCALES}
+_WORD = "|".join(sorted(list(_SMALL) + ["hundred"] + list(_SCALES), key=len, reverse=True))
+_NUMBER_WORDS = re.compile(rf"\b(?:{_WORD})(?:(?: |-)(?:and )?(?:{_WORD}))*\b")
+
+
+def _kind(word):
+    if word in _SCALES:
+        return "scale"
+    if word == "hundred":
+        return "hundred"
+    value = _SMALL[word]
+    return "unit" if value < 10 else "teen" if value < 20 else "tens"
+
+
+# Which kind of number word may follow which within one number: "twenty one", "three hundred (and) five",
+# "two thousand ten". Anything else ("one two three", "nine eleven", "five-seven") is separate numbers.
+_FOLLOWS = {
+    None: {"unit", "teen", "tens", "hundred", "scale"},
+    "unit": {"hundred", "scale"},
+    "teen": {"hundred", "scale"},
+    "tens": {"unit", "scale"},
+    "hundred": {"unit", "teen", "tens", "scale"},
+    "scale": {"unit", "teen", "tens"},
+}
+
+
+def _compound(words):
+    """The value of words that spell one number, or None if they don't"""
+    total = current = 0
+    last, last_scale, hundreds = None, None, False
+    for word in words:
+        if word == "and":
+            if last not in ("hundred", "scale"):
+                return None
+            continue
+        kind = _kind(word)
+        if kind not in _FOLLOWS[last]:
+            return None
+        if kind == "hundred":
+            if hundreds:
+                return None
+            current = max(current, 1) * 100
+            hundreds = True
+        elif kind == "scale":
+            # Scales only go down: "two million three thousand", never "three thousand two million"
+            if last_scale is not None and _SCALES[word] >= last_scale:
+                return None
+            total += max(current, 1) * _SCALES[word]
+            current, last_scale, hundreds = 0, _SCALES[word], False
+        else:
+            current += _SMALL[word]
+        last = kind
+    return total + current
+
+
+def _words_to_number(match):
+    text = match.group(0)
+    value = _compound(re.split(r"[ -]+", text))
+    if value is not None:
+        return str(value)
+    # Not one number: convert each word on its own, keeping the separators
+    return re.sub(r"[a-z]+", lambda m: str(_WORD_VALUES.get(m.group(0), m.group(0))), text)
+
+
+@rule
+def number_words(text):
+    return _NUMBER_WORDS.sub(_words_to_number, text)
+
+
+_THOUSANDS = re.compile(r"(?<=\d),(?=\d{3}\b)")
+
+
+@rule
+def thousands_separators(text):
+    return _THOUSANDS.sub("", text)
+
+
+# Spellings of each unit -> the one kept in the normalized answer, so "50 kilograms" and "50 kg" agree
+# but "50 kg" and "50 lbs" don't
+_UNIT_NAMES = {
+    "%": "% percent",
+    "°": "° degree degrees",
+    "km": "km kilometer kilometers kilometre kilometres",
+    "m": "m meter meters metre metres",
+    "cm": "cm centimeter centimeters",
+    "mm": "mm millimeter millimeters",
+    "mi": "mi mile miles",
+    "ft": "ft foot feet",
+    "in": "in inch inches",
+    "mph": "mph",
+    "km/h": "km/h kph",
+    "kg": "kg kilogram kilograms",
+    "g": "g gram grams",
+    "lb": "lb lbs pound pounds",
+    "oz": "oz ounce ounces",
+    "yr": "yr yrs year years",
+    "h": "h hr hrs hour hours",
+    "min": "min mins minute minutes",
+    "s": "s sec secs second seconds",
+    "usd": "usd dollar dollars",
+}
+_UNIT = {spelling: unit for unit, spellings in _UNIT_NAMES.items() for spelling in spellings.split()}
+_UNITS = "|".join(re.escape(u) for u in sorted(_UNIT, key=len, reverse=True))
+_NUMBER_WITH_UNIT = re.compile(
+    rf"^(?:about |approximately |around |~)?(\$)?(-?\d+(?:\.\d+)?) ?(?:({_UNITS})(?: old)?)?$")
+
+
+@rule
+def strip_units(text):
+    """'about 3 km' -> '3 km', '$40' -> '40 usd', '75 percent' -> '75 %'; '$120.00' -> '120 usd', '0.50' -> '0.5'"""
+    m = _NUMBER_WITH_UNIT.match(text)
+    if not m:
+        return text
+    dollar, number, unit = m.groups()
+    if "." in number:
+        number = format(Decimal(number).normalize(), "f")  # integers stay as written, so "007" isn't "7"
+    unit = _UNIT[unit] if unit else "usd" if dollar else None
+    return f"{number} {unit}" if unit else number
+
+
+_NORMALIZED_QUANTITY = re.compile(rf"^(-?\d+(?:\.\d+)?)(?: ({'|'.join(re.escape(u) for u in _UNIT_NAMES)}))?$")
+
+
+def quantity(form):
+    """(number text, unit or None) for a normalized numeric answer, else None"""
+    m = _NORMALIZED_QUANTITY.match(form)
+    return m.groups() if m else None
+
+
+@lru_cache(maxsize=65536)
+def normalize(text):
+    """Canonical form of an answer, after every registered rule"""
+    text = str(text)
+    for fn in RULES:
+        text = fn(text)
+    return text
+
+
+class Scorer:
+    """Scores answers against questions.json, with each question's accepted forms computed once.
+
+    A number with a unit only matches the same number in the same unit, except
+    that a unit on one side and none on the other is fine: "50 kg" is right for
+    an expected "50", and "50" for an expected "50 kg", but "50 lbs" isn't.
+    """
+    def __init__(self, questions):
+        self.specs = {}
+        for q in questions:
+            expected = [q.get("answer")] + list(q.get("alternate_answers") or [])
+            canonical = {normalize(a) for a in expected if a}
+            quantities = [qty for qty in map(quantity, canonical) if qty]
+            patterns = q.get("answer_regex") or []
+            if isinstance(patterns, str):
+                patterns = [patterns]
+            tolerance = q.get("tolerance")
+            self.specs.setdefault(question_id(q), (
+                canonical,
+                [re.compile(p, re.IGNORECASE) for p in patterns],
+                quantities,
+                None if tolerance is None else float(tolerance),
+            ))
+
+    def score(self, q, answer):
+        """1 if answer matches q's expected answer, alternates, regexes or tolerance, else 0"""
+        if not answer:
+            return 0
+        spec = self.specs.get(q.get("question_id") or question_id(q))
+        if spec is None:
+            return 0
+        canonical, patterns, targets, tolerance = spec
+        form = normalize(answer)
+        if form in canonical:
+            return 1
+        if any(p.fullmatch(form) for p in patterns):
+            return 1
+        qty = quantity(form) if targets else None
+        if qty:
+            number, unit = qty
+            for target, expected_unit in targets:
+                if unit != expected_unit and None not in (unit, expected_unit):
+                    continue
+                # Without a tolerance the number must be written the same, so "007" still isn't "7"
+                if number == target if tolerance is None else abs(float(number) - float(target)) <= tolerance:
+                    return 1
+        return 0
+
+    def rescore(self, results):
+        """{model: [score per result]} for a whole results.json-style dict"""
+        return {name: [self.score(r, r.get("response")) for r in rs] for name, rs in results.items()}
+
+
+# Known answers and what they must normalize to; python3 scoring.py --check runs them after any rule change
+NORMALIZE_CHECKS = [
+    ("Five-seveN", "5-7"),  # two numbers, not 5 + 7
+    ("FN Five-seveN", "fn 5-7"),
+    ("one two three", "1 2 3"),
+    ("nine eleven", "9 11"),
+    ("seven eleven", "7 11"),
+    ("twenty-one", "21"),
+    ("three hundred and five", "305"),
+    ("two thousand ten", "2010"),
+    ("$120.00", "120 usd"),
+    ("120", "120"),
+    ("0.50", "0.5"),
+    ("about 3 km", "3 km"),
+    ("50 kilograms", "50 kg"),
+    ("75 percent", "75 %"),
+    ("12 years old", "12 yr"),
+]
+# (question, answer, expected score)
+_FIVE_SEVEN = {"question": "What gun is this?", "image": "", "answer": "FN Five-seveN",
+               "alternate_answers": ["FiveSeven", "Five-Seven", "57"]}
+SCORE_CHECKS = [
+    (_FIVE_SEVEN, "12", 0),
+    (_FIVE_SEVEN, "fn 12", 0),
+    (_FIVE_SEVEN, "Five-seveN", 1),
+    (_FIVE_SEVEN, "57", 1),
+    ({"question": "How much?", "image": "", "answer": "$120.00"}, "120", 1),
+    ({"question": "How heavy?", "image": "", "answer": "50 lbs"}, "50 kg", 0),
+    ({"question": "How heavy?", "image": "", "answer": "50 lbs"}, "50 g", 0),
+    ({"question": "How heavy?", "image": "", "answer": "50 lbs"}, "50 pounds", 1),
+    ({"question": "How heavy?", "image": "", "answer": "50 lbs"}, "50", 1),
+    ({"question": "How far?", "image": "", "answer": "11.8%"}, "11.8 km", 0),
+    ({"question": "How big?", "image": "", "answer": "50 kg"}, "50 kilograms", 1),
+    ({"question": "How many?", "image": "", "answer": "50"}, "50 kg", 1),
+    ({"question": "Which agent?", "image": "", "answer": "007"}, "7", 0),
+    ({"question": "How far, roughly?", "image": "", "answer": "3 km", "tolerance": 0.5}, "3.4 km", 1),
+    ({"question": "How far, roughly?", "image": "", "answer": "3 km", "tolerance": 0.5}, "3.4 mi", 0),
+]
+
+
+def check():
+    """Failures among NORMALIZE_CHECKS and SCORE_CHECKS, as printable lines"""
+    failures = [f"normalize({text!r}) = {normalize(text)!r}, expected {expected!r}"
+                for text, expected in NORMALIZE_CHECKS if normalize(text) != expected]
+    scorer = Scorer([q for q, _, _ in SCORE_CHECKS])
+    failures += [f"{answer!r} for {q['answer']!r} scored {scorer.score(q, answer)}, expected {expected}"
+                 for q, answer, expected in SCORE_CHECKS if scorer.score(q, answer) != expected]
+    return failures
+
+
+def exact_match(answer, q):
+    """The original create_tsv.py rule: case/whitespace-insensitive equality with the answer or an alternate"""
+    if not answer:
+        return 0
+    clean = str(answer).strip().lower()
+    return int(any(a and clean == str(a).strip().lower() for a in [q.get("answer")] + list(q.get("alternate_answers") or [])))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Rescore results with the current normalization rules')
+    parser.add_argument('--results', default='results.json')
+    parser.add_argument('--changes', action='store_true', help='List answers scored differently from exact matching')
+    parser.add_argument('--check', action='store_true', help='Only run the built-in normalization/scoring checks')
+    args = parser.parse_args()
+
+    if args.check:
+        failures = check()
+        for failure in failures:
+            print(f"FAIL {failure}")
+        print(f"{len(NORMALIZE_CHECKS) + len(SCORE_CHECKS) - len(failures)} checks passed, {len(failures)} failed")
+        raise SystemExit(1 if failures else 0)
+
+    with open("questions.json") as f:
+        questions = json.load(f)
+    results = load_results(args.results)
+    by_id = {question_id(q): q for q in questions}
+
+    start = time.time()
+    scores = Scorer(questions).rescore(results)
+    elapsed = time.time() - start
+    print(f"Rescored {sum(len(s) for s in scores.values())} answers from {len(scores)} models in {elapsed * 1000:.0f} ms\n")
+
+    for name, rs in results.items():
+        exact = [exact_match(r.get("response"), by_id.get(r.get("question_id") or question_id(r), {})) for r in rs]
+        total = sum(scores[name])
+        print(f"{name}: {total}/{len(rs)} = {total / max(len(rs), 1) * 100:.1f}% (exact match {sum(exact)}, {total - sum(exact):+d})")
+        if args.changes:
+            for r, new, old in zip(rs, scores[name], exact):
+                if new != old:
+                    q = by_id.get(r.get("question_id") or question_id(r), {})
+                    print(f"  {old} -> {new}  {r.get('response')!r} vs {q.get('answer')!r}  ({r['question'][:50]})")
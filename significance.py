@@ -0,0 +1,129 @@
+"""Bootstrap confidence intervals and paired significance tests for analyze_cleaned_results.py.
+
+Everything works on (questions x columns) 0/1 matrices, so one matrix product
+per block of resamples covers every model, tag and domain at once. A block of
+bootstrap resamples is a (resamples x questions) matrix of multinomial
+counts: row r says how many times each question was drawn in resample r.
+Blocks are independent, so they can be spread over worker processes.
+"""
+import math, os, warnings
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+RESAMPLES = 10000
+BLOCK = 1000  # resamples per matrix product / per task
+
+
+def _blocks(resamples, seed):
+    """(seed sequence, size) per block of resamples"""
+    sizes = [min(BLOCK, resamples - start) for start in range(0, resamples, BLOCK)]
+    return list(zip(np.random.SeedSequence(seed).spawn(len(sizes)), sizes))
+
+
+def _bootstrap_block(seed, size, correct, answered):
+    rng = np.random.default_rng(seed)
+    n = correct.shape[0]
+    weights = rng.multinomial(n, np.full(n, 1.0 / n), size=size).astype(np.float32)
+    hits = weights @ correct
+    counts = weights @ answered
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(counts > 0, hits / counts, np.nan)
+
+
+def _map_blocks(fn, blocks, args, workers):
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers <= 1 or len(blocks) == 1:
+        return [fn(seed, size, *args) for seed, size in blocks]
+    with ProcessPoolExecutor(max_workers=min(workers, len(blocks))) as pool:
+        futures = [pool.submit(fn, seed, size, *args) for seed, size in blocks]
+        return [f.result() for f in futures]
+
+
+def bootstrap_accuracy(correct, answered, resamples=RESAMPLES, confidence=0.95, seed=0, workers=None):
+    """Percentile bootstrap CI of correct/answered for every column, resampling questions.
+
+    correct and answered are (questions x K) 0/1 matrices; a column can be one
+    model restricted to one tag or domain (zeros elsewhere). Returns (low, high)
+    arrays of K accuracies in percent.
+    """
+    correct = np.asarray(correct, dtype=np.float32)
+    answered = np.asarray(answered, dtype=np.float32)
+    if correct.shape[0] == 0:
+        empty = np.full(correct.shape[1], np.nan)
+        return empty, empty.copy()
+    samples = np.concatenate(_map_blocks(_bootstrap_block, _blocks(resamples, seed), (correct, answered), workers))
+    tail = (1 - confidence) / 2 * 100
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)  # columns with no answers are all-NaN
+        low, high = np.nanpercentile(samples, [tail, 100 - tail], axis=0)
+    return low * 100, high * 100
+
+
+def _permutation_block(seed, size, diffs):
+    rng = np.random.default_rng(seed)
+    signs = rng.choice(np.array([-1.0, 1.0], dtype=np.float32), size=(size, diffs.shape[0]))
+    observed = np.abs(diffs.sum(axis=0))
+    return (np.abs(signs @ diffs) >= observed - 1e-6).sum(axis=0)
+
+
+def permutation_test(diffs, resamples=RESAMPLES, seed=0, workers=None):
+    """Paired sign-flip permutation p-values, one per column of diffs.
+
+    diffs is (questions x pairs) of a_correct - b_correct, 0 where either model
+    didn't answer. Under the null, each question's difference is equally
+    likely to have either sign.
+    """
+    diffs = np.asarray(diffs, dtype=np.float32)
+    if diffs.shape[0] == 0:
+        return np.ones(diffs.shape[1])
+    extreme = sum(_map_blocks(_permutation_block, _blocks(resamples, seed), (diffs,), workers))
+    return (extreme + 1) / (resamples + 1)
+
+
+def pass_at_k(n, c, k):
+    """Unbiased pass@k per question from n samples with c correct: 1 - C(n-c, k) / C(n, k). Needs k <= n."""
+    n, c = np.asarray(n, dtype=float), np.asarray(c, dtype=float)
+    fail = np.ones_like(n)
+    for i in range(k):
+        fail *= np.clip(n - c - i, 0, None) / (n - i)
+    return 1 - fail
+
+
+def mcnemar(a, b):
+    """Exact McNemar test on paired 0/1 vectors: (only a right, only b right, two-sided p)"""
+    only_a = int(np.sum((a == 1) & (b == 0)))
+    only_b = int(np.sum((a == 0) & (b == 1)))
+    n = only_a + only_b
+    if n == 0:
+        return only_a, only_b, 1.0
+    tail = sum(math.comb(n, i) for i in range(min(only_a, only_b) + 1))
+    return only_a, only_b, min(1.0, 2 * tail / 2 ** n)
+
+
+def pairwise_tests(correct, answered, names, resamples=RESAMPLES, seed=0, workers=None):
+    """McNemar and permutation tests for every pair of columns, on the questions both answered"""
+    correct = np.asarray(correct, dtype=np.float32)
+    answered = np.asarray(answered, dtype=bool)
+    pairs = [(i, j) for i in range(len(names)) for j in range(i + 1, len(names))]
+    if not pairs:
+        return []
+    both = np.stack([answered[:, i] & answered[:, j] for i, j in pairs], axis=1)
+    diffs = np.stack([correct[:, i] - correct[:, j] for i, j in pairs], axis=1) * both
+    p_perm = permutation_test(diffs, resamples, seed, workers)
+
+    tests = []
+    for k, (i, j) in enumerate(pairs):
+        mask = both[:, k]
+        a, b = correct[mask, i], correct[mask, j]
+        only_a, only_b, p_mcnemar = mcnemar(a, b)
+        shared = int(mask.sum())
+        tests.append({
+            "a": names[i], "b": names[j], "questions": shared,
+            "a_accuracy": float(a.mean() * 100) if shared else 0.0,
+            "b_accuracy": float(b.mean() * 100) if shared else 0.0,
+            "only_a": only_a, "only_b": only_b,
+            "mcnemar_p": p_mcnemar, "permutation_p": float(p_perm[k]),
+        })
+    return tests
@@ -0,0 +1,158 @@
+"""Streamed completions for run.py --stream.
+
+Chunks are read as they arrive from either provider, so a request records
+time to first token and tokens/sec, and can be cut off at a wall-clock or
+token ceiling instead of holding a worker for the whole of a runaway answer.
+Tokens are counted as streamed deltas (content or reasoning), about one token
+each. Hidden reasoning that is never streamed only counts against the clock.
+
+A request that is cut off keeps whatever content and reasoning had arrived.
+Providers only send usage at the end of a stream, so its token counts are the
+streamed estimate and its cost is unknown.
+"""
+import asyncio, time
+
+
+class StreamReader:
+    """Accumulates one streamed completion and decides when to stop reading it"""
+    def __init__(self, sent, max_seconds=None, max_tokens=None):
+        self.sent = sent
+        self.deadline = sent + max_seconds if max_seconds else None
+        self.max_tokens = max_tokens
+        self.content, self.reasoning = [], []
+        self.tokens = self.reasoning_tokens = 0
+        self.first = self.last = None
+        self.usage = None
+        self.response = None  # xAI: the SDK's accumulated Response
+        self.cutoff = None  # "time" or "tokens"
+        self.finished = False  # the provider said the answer was complete
+
+    def add(self, content=None, reasoning=None):
+        """Record one delta; returns False once a ceiling is reached and reading should stop"""
+        now = time.time()
+        if content or reasoning:
+            if self.first is None:
+                self.first = now
+            self.last = now
+            self.tokens += 1
+            if content:
+                self.content.append(content)
+            if reasoning:
+                self.reasoning.append(reasoning)
+                self.reasoning_tokens += 1
+        if self.max_tokens and self.tokens >= self.max_tokens:
+            self.cutoff = "tokens"
+        elif self.past_deadline(now):
+            self.cutoff = "time"
+        return self.cutoff is None
+
+    def past_deadline(self, now=None):
+        return self.deadline is not None and (now or time.time()) >= self.deadline
+
+    def remaining(self):
+        return None if self.deadline is None else max(0.0, self.deadline - time.time())
+
+    def timed_out(self, e):
+        """Whether e is the wall-clock ceiling expiring rather than a real failure"""
+        if not self.past_deadline(time.time() + 0.1):  # timers and the wall clock can disagree slightly
+            return False
+        import openai  # deferred like in rate_limit.py; it's loaded by the time a request fails
+        if isinstance(e, (openai.APITimeoutError, TimeoutError)):
+            return True
+        code = getattr(e, "code", None)  # grpc.RpcError from the xAI SDK
+        return callable(code) and getattr(code(), "name", None) == "DEADLINE_EXCEEDED"
+
+    def stats(self, completion_tokens=None):
+        """What result["stream"] records: time to first token, decode rate, and the cutoff if any"""
+        tokens = completion_tokens or self.tokens
+        decode = (self.last - self.first) if self.first is not None else 0.0
+        stats = {
+            "ttft": None if self.first is None else self.first - self.sent,
+            "tokens_per_sec": tokens / decode if decode > 0 else None,
+            "streamed_tokens": self.tokens,
+        }
+        if self.cutoff:
+            stats["cutoff"] = self.cutoff
+        return stats
+
+
+def _add_openai_chunk(reader, chunk):
+    if chunk.usage:
+        reader.usage = chunk.usage  # the last chunk, with stream_options={"include_usage": True}
+    if not chunk.choices:
+        return True
+    if chunk.choices[0].finish_reason:
+        reader.finished = True
+    delta = chunk.choices[0].delta
+    # OpenRouter streams reasoning as an extra "reasoning" field on the delta
+    return reader.add(delta.content, getattr(delta, "reasoning", None))
+
+
+def _check_finished(reader, stream):
+    # A connection that closes cleanly mid-answer would otherwise pass for a short answer
+    if not reader.cutoff and not reader.finished:
+        import openai
+        raise openai.APIConnectionError(message="Stream ended before the answer finished",
+                                        request=stream.response.request)
+
+
+def read_openai(open_stream, reader):
+    """Read an OpenAI-compatible chunk stream into reader; open_stream() starts the request.
+
+    The request's read timeout should be the wall-clock ceiling, so a silent
+    server can't hold the call much past it; that timeout counts as a cutoff.
+    """
+    try:
+        with open_stream() as stream:
+            for chunk in stream:
+                if not _add_openai_chunk(reader, chunk):
+                    break
+            _check_finished(reader, stream)
+    except Exception as e:
+        if not reader.timed_out(e):
+            raise
+        reader.cutoff = "time"
+
+
+async def read_openai_async(open_stream, reader):
+    try:
+        async with asyncio.timeout(reader.remaining()):
+            async with await open_stream() as stream:
+                async for chunk in stream:
+                    if not _add_openai_chunk(reader, chunk):
+                        break
+                _check_finished(reader, stream)
+    except Exception as e:
+        if not reader.timed_out(e):
+            raise
+        reader.cutoff = "time"
+
+
+def read_xai(stream, reader):
+    """Read an xAI chat.stream() into reader. The client's gRPC deadline enforces the wall-clock ceiling."""
+    try:
+        for response, chunk in stream:
+            reader.response = response
+            if not reader.add(chunk.content, chunk.reasoning_content):
+                break
+    except Exception as e:
+        if not reader.timed_out(e):
+            raise
+        reader.cutoff = "time"
+    finally:
+        stream.close()
+
+
+async def read_xai_async(stream, reader):
+    try:
+        async with asyncio.timeout(reader.remaining()):
+            async for response, chunk in stream:
+                reader.response = response
+                if not reader.add(chunk.content, chunk.reasoning_content):
+                    break
+    except Exception as e:
+        if not reader.timed_out(e):
+            raise
+        reader.cutoff = "time"
+    finally:
+        await stream.aclose()